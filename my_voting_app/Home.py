@@ -1,10 +1,9 @@
 import streamlit as st
 import os
 from PIL import Image
-import base64
 import google_auth_oauthlib.flow
 import json # ▼追加：Cloudの設定を読み込むために必要
-from background import set_background
+from background import asset_url, set_background
 
 # ---------------------------------------------------------
 # 1. 設定 & 定数
@@ -13,6 +12,8 @@ PAGE_TITLE = "投票アプリ Home"
 APP_DESCRIPTION = "チームの意見を一つに。新しい議題を作ったり、投票に参加しましょう。"
 BASE_DIR = os.path.dirname(os.path.abspath(__file__))
 PAGEICON_PATH = os.path.join(BASE_DIR, "images/icon_01.png")
+PAGEICON_NAME = "icon_01.png"
+HEADER_ICON_SIZE = 40
 
 # Googleログイン設定
 CLIENT_SECRETS_FILE = os.path.join(BASE_DIR, "client_secret.json")
@@ -48,12 +49,12 @@ st.markdown("""
     </style>
     """, unsafe_allow_html=True)
 
-def header_with_icon(icon_path, text):
-    with open(icon_path, "rb") as f:
-        encoded = base64.b64encode(f.read()).decode()
+def header_with_icon(icon_name, text):
+    # アイコンは表示サイズの 2 倍に縮小した画像を URL で参照する（background.asset_url）
+    icon_url = asset_url(icon_name, HEADER_ICON_SIZE * 2)
     header_html = f"""
     <div style="display:flex; align-items:center; gap:10px;">
-        <img src="data:image/png;base64,{encoded}" width="40">
+        <img src="{icon_url}" width="{HEADER_ICON_SIZE}">
         <h1 style="margin:0;">{text}</h1>
     </div>
     """
@@ -140,7 +141,7 @@ def main():
     # --- ログイン済み ---
     
     with st.container(border=True):
-        header_with_icon(PAGEICON_PATH, "投票アプリへようこそ！")
+        header_with_icon(PAGEICON_NAME, "投票アプリへようこそ！")
         st.markdown(APP_DESCRIPTION)
         st.caption(f"ログイン中: {st.session_state.logged_in_user}")
         st.divider()
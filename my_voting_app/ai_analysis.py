@@ -0,0 +1,435 @@
+import hashlib
+import json
+import os
+import queue
+import threading
+import time
+import unicodedata
+from concurrent.futures import FIRST_COMPLETED, CancelledError, ThreadPoolExecutor, wait
+import pandas as pd
+import streamlit as st
+
+# ---------------------------------------------------------
+# Gemini による投票結果の分析
+# ---------------------------------------------------------
+# google-genai の読み込みとクライアントの作成は、最初に分析する時に 1 回だけ行います。
+# 結果ページを開いただけ（ボタンを押していない時）には何もしません。
+# モデルは generate(prompt) を持つオブジェクトなら何でもよく、テストでは偽物に差し替えられます。
+# generate_stream(prompt) も持っていれば、届いた部分から順に表示できます。
+
+# 使うモデル（"gemini" / ネットワークを使わない "stub"）
+ANALYSIS_MODEL = os.getenv("ANALYSIS_MODEL", "gemini")
+GEMINI_MODEL = os.getenv("GEMINI_MODEL", "gemini-2.5-flash")
+# 分析を打ち切るまでの秒数
+ANALYSIS_TIMEOUT_SECONDS = float(os.getenv("ANALYSIS_TIMEOUT_SECONDS", "120"))
+# 自由回答を分けて要約する時の、1 回あたりのデータ量（トークン数の目安）と同時実行数
+ANALYSIS_BATCH_TOKENS = int(os.getenv("ANALYSIS_BATCH_TOKENS", "3000"))
+ANALYSIS_MAP_WORKERS = int(os.getenv("ANALYSIS_MAP_WORKERS", "4"))
+
+# 分析結果の保存先と、保存しておく件数・日数
+BASE_DIR = os.path.dirname(os.path.abspath(__file__))
+ANALYSIS_CACHE_DIR = os.getenv("ANALYSIS_CACHE_DIR", os.path.join(BASE_DIR, "analysis_cache"))
+ANALYSIS_CACHE_MAX_ENTRIES = int(os.getenv("ANALYSIS_CACHE_MAX_ENTRIES", "200"))
+ANALYSIS_CACHE_MAX_AGE_DAYS = float(os.getenv("ANALYSIS_CACHE_MAX_AGE_DAYS", "90"))
+
+ANALYSIS_INSTRUCTIONS = """
+# 命令: あなたは厳格で経験豊富なデータアナリストです。
+以下の「制約事項」と「出力テンプレート」を**一言一句厳守**し、提供されたCSVデータを分析してください。
+
+# 制約事項 (重要)
+1. **生データの隠蔽**: 入力されたCSVデータ自体は、回答に**絶対に**含めないでください。
+2. **フォーマット厳守**: 以下の「出力テンプレート」の構造、見出し、箇条書きのスタイルを崩さないでください。
+3. **可読性向上**: 重要な数値（得票数やパーセンテージ）やキーワードは **太字** で強調してください。
+4. **客観性**: 主観的な感想は排除し、データに基づいた事実と論理的な推測のみを記述してください。
+5. **テンプレート外禁止**: テンプレートに書かれていない文言は**絶対に出力しない**でください。
+6. **終了条件**: 出力はテンプレートの最終行までで終了すること。
+
+# 出力テンプレート
+---
+## 📊 分析概要
+（ここに、データ全体から読み取れる最も重要な結論を2〜3行で簡潔に記述。）
+
+## 📈 投票傾向
+- **（傾向の要約1）**: （具体的な数値を用いる）
+- **（傾向の要約2）**
+- **（傾向の要約3）**
+
+## 🧠 支持理由の推測
+- **（推測される理由1）**
+- **（推測される理由2）**
+
+## 🔍 全体の特徴・特異点
+- （分布の特徴）
+- （特筆すべき点）
+
+"""
+
+ANALYSIS_PROMPT_TEMPLATE = ANALYSIS_INSTRUCTIONS + """# 解析対象データ
+議題:{topic}
+CSVデータ:{csv}
+"""
+
+# 自由回答が多い時の、部分ごとの要約（map）と、それをまとめる最終分析（reduce）
+MAP_PROMPT_TEMPLATE = """
+# 命令: あなたは経験豊富なデータアナリストです。
+以下は議題「{topic}」への自由回答の一部（{index}/{total}）です。
+同じ趣旨の回答をまとめ、意見のグループごとに「要約」と「投票数の合計」を箇条書きで簡潔に出力してください。
+回答をそのまま長く引用したり、データにない内容を推測したりしないでください。
+
+# 回答データ（CSV）
+{csv}
+"""
+
+REDUCE_PROMPT_TEMPLATE = ANALYSIS_INSTRUCTIONS + """# 解析対象データ
+議題:{topic}
+自由回答:{answers} 件（{groups} 種類）
+※回答が多いため、CSVデータの代わりに回答を分けて要約したものを示します。
+部分ごとの要約:
+{summaries}
+"""
+
+
+def build_prompt(topic, result_df):
+    return ANALYSIS_PROMPT_TEMPLATE.format(topic=topic, csv=result_df.to_csv(index=False))
+
+def estimate_tokens(text):
+    # 日本語はおおよそ 1 文字 1 トークンなので、文字数を多めの目安として使う
+    return len(text)
+
+# ---------------------------------------------------------
+# 自由回答の下ごしらえ
+# ---------------------------------------------------------
+def group_answers(result_df):
+    """自由回答の表記ゆれ（全角・半角、大文字・小文字、空白）をそろえてまとめる。
+
+    result_df と同じ「選択肢」「投票数」の列で、票数の多い順に返します。
+    表示する文言は、まとめた中で一番票の多い書き方です。
+    """
+    groups = {}  # そろえた文言 -> {書き方: 票数}
+    for answer, count in zip(result_df["選択肢"], result_df["投票数"]):
+        text = " ".join(str(answer).split())
+        key = unicodedata.normalize("NFKC", text).casefold()
+        if not key:
+            continue
+        variants = groups.setdefault(key, {})
+        variants[text] = variants.get(text, 0) + int(count)
+
+    rows = [
+        {"選択肢": max(variants, key=variants.get), "投票数": sum(variants.values())}
+        for variants in groups.values()
+    ]
+    rows.sort(key=lambda row: row["投票数"], reverse=True)
+    return pd.DataFrame(rows, columns=["選択肢", "投票数"])
+
+def split_batches(df, budget):
+    """df を、CSV にした時のトークン数の目安が budget 以下になるよう分ける。"""
+    batches, current, size = [], [], 0
+    for row in df.itertuples(index=False):
+        line = estimate_tokens(f"{row[0]},{row[1]}\n")
+        if current and size + line > budget:
+            batches.append(current)
+            current, size = [], 0
+        current.append(row)
+        size += line
+    if current:
+        batches.append(current)
+    return [pd.DataFrame(batch, columns=df.columns) for batch in batches]
+
+
+class GeminiModel:
+    def __init__(self, api_key, model):
+        self.api_key = api_key
+        self.model = model
+        self._lock = threading.Lock()
+        self._client = None
+
+    def _get_client(self):
+        with self._lock:
+            if self._client is None:
+                from google import genai
+                self._client = genai.Client(api_key=self.api_key)
+            return self._client
+
+    def generate(self, prompt):
+        response = self._get_client().models.generate_content(
+            model=self.model,
+            contents=prompt
+        )
+        return response.text
+
+    def generate_stream(self, prompt):
+        stream = self._get_client().models.generate_content_stream(
+            model=self.model,
+            contents=prompt
+        )
+        for chunk in stream:
+            if chunk.text:
+                yield chunk.text
+
+
+class StubModel:
+    """ネットワークを使わずに決まった文章を返すモデル（テスト・ローカル確認用）。"""
+
+    model = "stub"
+
+    def __init__(self, text="## 📊 分析概要\n（スタブによる分析結果です）\n", chunk_size=8, delay=0.05):
+        self.text = text
+        self.chunk_size = chunk_size
+        self.delay = delay
+
+    def generate(self, prompt):
+        return self.text
+
+    def generate_stream(self, prompt):
+        for i in range(0, len(self.text), self.chunk_size):
+            time.sleep(self.delay)
+            yield self.text[i:i + self.chunk_size]
+
+
+# ---------------------------------------------------------
+# 分析結果の保存（同じ集計なら AI を呼ばずに返す）
+# ---------------------------------------------------------
+# キーは「議題の uuid」＋「モデル名・プロンプト（テンプレートと集計の CSV）のハッシュ」です。
+# 締切済みの議題は集計が変わらないので、2 回目以降はファイルを読むだけで済みます。
+# 1 件 1 ファイルの JSON で保存し、最後に使った時刻（ファイルの更新時刻）が
+# 古いものから、件数・日数の上限を超えた分を消します。
+
+class AnalysisCache:
+    def __init__(self, directory, max_entries, max_age_days):
+        self.directory = directory
+        self.max_entries = max_entries
+        self.max_age = max_age_days * 24 * 60 * 60
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def make_key(uuid, model, prompt):
+        digest = hashlib.sha256(f"{model}\n{prompt}".encode("utf-8")).hexdigest()[:16]
+        return f"{uuid}-{digest}"
+
+    def _path(self, key):
+        return os.path.join(self.directory, f"{key}.json")
+
+    def get(self, key):
+        path = self._path(key)
+        with self._lock:
+            try:
+                with open(path, encoding="utf-8") as f:
+                    text = json.load(f)["text"]
+            except (OSError, ValueError, KeyError):
+                return None
+            if time.time() - os.path.getmtime(path) >= self.max_age:
+                return None
+            # 使った時刻を更新する（消す順番に使う）
+            os.utime(path)
+            return text
+
+    def put(self, key, text):
+        path = self._path(key)
+        try:
+            with self._lock:
+                os.makedirs(self.directory, exist_ok=True)
+                with open(path + ".tmp", "w", encoding="utf-8") as f:
+                    json.dump({"text": text}, f, ensure_ascii=False)
+                os.replace(path + ".tmp", path)
+                self._evict()
+        except OSError:
+            # 保存できなくても分析結果はそのまま表示する
+            pass
+
+    def _evict(self):
+        now = time.time()
+        entries = []
+        for filename in os.listdir(self.directory):
+            if not filename.endswith(".json"):
+                continue
+            path = os.path.join(self.directory, filename)
+            used_at = os.path.getmtime(path)
+            if now - used_at >= self.max_age:
+                os.remove(path)
+            else:
+                entries.append((used_at, path))
+        entries.sort()
+        for _, path in entries[:max(len(entries) - self.max_entries, 0)]:
+            os.remove(path)
+
+
+# ---------------------------------------------------------
+# 分析サービス
+# ---------------------------------------------------------
+# analyze_stream() はモデルの出力を別スレッドで受け取り、届いた部分から順に返します
+# （st.write_stream にそのまま渡せます）。
+# timeout 秒で終わらなければ TimeoutError にし、途中で読むのをやめた時
+# （タイムアウト・画面の再実行など）はモデル側の生成も止めます。
+# 最後まで受け取れた分析だけを保存します。
+#
+# 自由回答が多く 1 回のプロンプトに収まらない時は、回答をまとめてから
+# ANALYSIS_BATCH_TOKENS ごとに分け、それぞれの要約を小さなスレッドプールで同時に作り（map）、
+# 最後にそれらの要約から通常と同じ形式の分析を作ります（reduce）。
+# map の間は on_progress(終わった数, 全体の数) で進み具合を知らせます。
+# タイムアウトや画面の再実行で途中で終わった時は、実行中の要約も止めます
+# （Future.cancel() は始まる前の要約しか止められないため、各要約が cancel を確かめます）。
+
+_STREAM_END = object()
+
+class AnalysisService:
+    def __init__(self, model, cache=None, batch_tokens=ANALYSIS_BATCH_TOKENS, map_workers=ANALYSIS_MAP_WORKERS):
+        self.model = model
+        self.cache = cache
+        self.batch_tokens = batch_tokens
+        self._executor = ThreadPoolExecutor(max_workers=map_workers, thread_name_prefix="analysis-map")
+
+    def _cache_key(self, uuid, prompt):
+        if self.cache is None or uuid is None:
+            return None
+        return AnalysisCache.make_key(uuid, getattr(self.model, "model", ""), prompt)
+
+    def _summarize(self, prompt, cancel):
+        """map の 1 回分。cancel が立ったら生成をやめて CancelledError にする。"""
+        if cancel.is_set():
+            raise CancelledError()
+        if not hasattr(self.model, "generate_stream"):
+            return self.model.generate(prompt)
+
+        stream = self.model.generate_stream(prompt)
+        parts = []
+        try:
+            for chunk in stream:
+                if cancel.is_set():
+                    raise CancelledError()
+                parts.append(chunk)
+        finally:
+            close = getattr(stream, "close", None)
+            if close is not None:
+                close()
+        return "".join(parts)
+
+    def _final_prompt(self, topic, result_df, free_input, deadline, on_progress=None):
+        """最後にモデルへ送るプロンプトを返す（自由回答が多い時は map を済ませてから）。"""
+        if not free_input:
+            return build_prompt(topic, result_df)
+
+        grouped = group_answers(result_df)
+        prompt = build_prompt(topic, grouped)
+        if estimate_tokens(grouped.to_csv(index=False)) <= self.batch_tokens:
+            return prompt
+
+        batches = split_batches(grouped, self.batch_tokens)
+        cancel = threading.Event()
+        futures = [
+            self._executor.submit(self._summarize, MAP_PROMPT_TEMPLATE.format(
+                topic=topic, index=i + 1, total=len(batches), csv=batch.to_csv(index=False),
+            ), cancel)
+            for i, batch in enumerate(batches)
+        ]
+        try:
+            not_done = set(futures)
+            while not_done:
+                if on_progress is not None:
+                    on_progress(len(futures) - len(not_done), len(futures))
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    raise TimeoutError("回答の要約が時間内に終わりませんでした")
+                _, not_done = wait(not_done, timeout=remaining, return_when=FIRST_COMPLETED)
+            if on_progress is not None:
+                on_progress(len(futures), len(futures))
+        finally:
+            # 途中で終わった時（タイムアウト・エラー・画面の再実行）は残りの要約を止める
+            cancel.set()
+            for future in futures:
+                future.cancel()
+
+        summaries = "\n\n".join(
+            f"## 部分 {i + 1}\n{future.result()}" for i, future in enumerate(futures)
+        )
+        return REDUCE_PROMPT_TEMPLATE.format(
+            topic=topic,
+            answers=int(grouped["投票数"].sum()),
+            groups=len(grouped),
+            summaries=summaries,
+        )
+
+    def analyze(self, topic, result_df, uuid=None, free_input=False, timeout=ANALYSIS_TIMEOUT_SECONDS):
+        """議題 topic の集計表 result_df を分析し、Markdown の文章を返す。
+
+        cache があり uuid を指定した場合は、同じ集計の分析結果を保存・再利用します。
+        free_input が True なら、回答をまとめ、多い時は分けて要約してから分析します。
+        """
+        deadline = time.monotonic() + timeout
+        key = self._cache_key(uuid, build_prompt(topic, result_df))
+        text = self.cache.get(key) if key else None
+        if text is None:
+            text = self.model.generate(self._final_prompt(topic, result_df, free_input, deadline))
+            if key:
+                self.cache.put(key, text)
+        return text
+
+    def analyze_stream(self, topic, result_df, uuid=None, free_input=False, timeout=ANALYSIS_TIMEOUT_SECONDS,
+                       on_progress=None):
+        """analyze() と同じ分析を、届いた部分から順に返すジェネレーター。
+
+        on_progress を指定すると、回答を分けて要約している間の進み具合
+        （終わった数, 全体の数）を知らせます。
+        """
+        deadline = time.monotonic() + timeout
+        key = self._cache_key(uuid, build_prompt(topic, result_df))
+        text = self.cache.get(key) if key else None
+        if text is not None:
+            yield text
+            return
+
+        prompt = self._final_prompt(topic, result_df, free_input, deadline, on_progress)
+        parts = []
+        for chunk in self._stream(prompt, max(deadline - time.monotonic(), 0)):
+            parts.append(chunk)
+            yield chunk
+        if key:
+            self.cache.put(key, "".join(parts))
+
+    def _stream(self, prompt, timeout):
+        chunks = queue.Queue()
+        cancel = threading.Event()
+
+        def produce():
+            try:
+                if hasattr(self.model, "generate_stream"):
+                    stream = self.model.generate_stream(prompt)
+                else:
+                    stream = iter([self.model.generate(prompt)])
+                try:
+                    for chunk in stream:
+                        if cancel.is_set():
+                            break
+                        chunks.put(chunk)
+                finally:
+                    close = getattr(stream, "close", None)
+                    if close is not None:
+                        close()
+            except Exception as e:
+                chunks.put(e)
+            else:
+                chunks.put(_STREAM_END)
+
+        threading.Thread(target=produce, name="analysis-stream", daemon=True).start()
+        deadline = time.monotonic() + timeout
+        try:
+            while True:
+                try:
+                    item = chunks.get(timeout=max(deadline - time.monotonic(), 0))
+                except queue.Empty:
+                    raise TimeoutError(f"{timeout:.0f} 秒以内に分析が終わりませんでした")
+                if item is _STREAM_END:
+                    return
+                if isinstance(item, Exception):
+                    raise item
+                yield item
+        finally:
+            cancel.set()
+
+
+@st.cache_resource
+def get_analysis_service():
+    cache = AnalysisCache(ANALYSIS_CACHE_DIR, ANALYSIS_CACHE_MAX_ENTRIES, ANALYSIS_CACHE_MAX_AGE_DAYS)
+    if ANALYSIS_MODEL == "stub":
+        return AnalysisService(StubModel(), cache)
+    # 環境変数から API キーを取得
+    return AnalysisService(GeminiModel(os.getenv('GEMINI_API_KEY'), GEMINI_MODEL), cache)
@@ -1,27 +1,72 @@
 import base64
+import hashlib
+import io
 import streamlit as st
 import os
+from PIL import Image
+
+# このファイル（background.py）があるディレクトリを基準にする
+BASE_DIR = os.path.dirname(os.path.abspath(__file__))
+IMAGES_DIR = os.path.join(BASE_DIR, "images")
+# Home.py と同じ階層の static/ は、server.enableStaticServing で app/static/ として配信されます
+STATIC_DIR = os.path.join(BASE_DIR, "static")
+STATIC_URL = "app/static"
+
+# 背景画像は画面幅、アイコンは表示サイズの 2 倍（高解像度の画面用）まで縮小します
+BACKGROUND_MAX_SIZE = 1920
+WEBP_QUALITY = 80
+
+# ---------------------------------------------------------
+# 画像の配信（プロセスごとに 1 回だけ変換）
+# ---------------------------------------------------------
+# 画像を毎回 base64 にしてページに埋め込むと、再実行のたびに数百 KB を送ることになります。
+# 最初の 1 回だけ表示サイズに縮小して WebP に変換し、内容のハッシュを付けた名前で
+# static/ に書き出して、ページには短い URL だけを書きます。
+# 名前が内容で決まるので、ブラウザは同じ画像をキャッシュから表示できます。
+
+@st.cache_resource(show_spinner=False)
+def asset_url(image_name, max_size=None):
+    """images/ の画像を変換して URL を返す。画像が無い時は None。"""
+    image_path = os.path.join(IMAGES_DIR, image_name)
+    if not os.path.exists(image_path):
+        return None
+
+    with Image.open(image_path) as img:
+        if img.mode not in ("RGB", "RGBA"):
+            img = img.convert("RGBA")
+        if max_size:
+            img.thumbnail((max_size, max_size))
+        buf = io.BytesIO()
+        img.save(buf, "WEBP", quality=WEBP_QUALITY)
+    data = buf.getvalue()
+
+    # 静的ファイル配信が無効な時は、変換後の小さな画像を埋め込む
+    if not st.get_option("server.enableStaticServing"):
+        return "data:image/webp;base64," + base64.b64encode(data).decode()
+
+    digest = hashlib.sha256(data).hexdigest()[:12]
+    filename = f"{os.path.splitext(image_name)[0]}.{digest}.webp"
+    path = os.path.join(STATIC_DIR, filename)
+    if not os.path.exists(path):
+        os.makedirs(STATIC_DIR, exist_ok=True)
+        with open(path + ".tmp", "wb") as f:
+            f.write(data)
+        os.replace(path + ".tmp", path)
+    return f"{STATIC_URL}/{filename}"
+
 
 def set_background(image_name):
-    # このファイル（background.py）があるディレクトリを基準にする
-    base_path = os.path.dirname(__file__)
-    
-    # imagesフォルダの画像を参照
-    image_path = os.path.join(base_path, "images", image_name)
+    url = asset_url(image_name, BACKGROUND_MAX_SIZE)
 
     # 画像が存在しない時のデバッグ表示（超重要）
-    if not os.path.exists(image_path):
-        st.error(f"背景画像が見つかりません: {image_path}")
+    if url is None:
+        st.error(f"背景画像が見つかりません: {os.path.join(IMAGES_DIR, image_name)}")
         return
 
-    # base64化して背景適用
-    with open(image_path, "rb") as f:
-        encoded = base64.b64encode(f.read()).decode()
-
     css = f"""
     <style>
     [data-testid="stAppViewContainer"] {{
-        background-image: url("data:image/png;base64,{encoded}");
+        background-image: url("{url}");
         background-size: cover;
         background-position: center;
         background-repeat: no-repeat;
@@ -1,26 +1,91 @@
 import gspread
+import google.auth.exceptions
+import requests
 from oauth2client.service_account import ServiceAccountCredentials
 import pandas as pd
 import streamlit as st
 import os
 import datetime
+import threading
+import time
+import queue
+import atexit
+import contextlib
+import json
+import heapq
+import random
+import re
+import uuid as uuid_lib
+import pyarrow.feather as feather
+from concurrent.futures import Future, ThreadPoolExecutor, TimeoutError as FutureTimeoutError
+from storage import (
+    StorageBackend, TIMEZONE, VOTE_COLUMNS,
+    apply_schema, empty_topics, empty_votes, frame_from_columns, parse_deadline,
+)
 
 # ---------------------------------------------------------
 # 設定
 # ---------------------------------------------------------
 SPREADSHEET_NAME = "voting_app_db"
 KEY_FILE = "key.json"
+BASE_DIR = os.path.dirname(os.path.abspath(__file__))
+# 保存先: "sheets"（Googleスプレッドシート）または "sqlite"
+STORAGE_BACKEND = os.getenv("STORAGE_BACKEND", "sheets")
+SQLITE_PATH = os.getenv("SQLITE_PATH", os.path.join(BASE_DIR, "voting_app.db"))
+# 読み込みキャッシュの有効期間（秒）。0 にするとキャッシュしません
+CACHE_TTL_SECONDS = float(os.getenv("CACHE_TTL_SECONDS", "30"))
+# votes を全件読み直す間隔（秒）。手作業での編集・削除はこのタイミングで反映されます
+VOTES_FULL_RESYNC_SECONDS = float(os.getenv("VOTES_FULL_RESYNC_SECONDS", "600"))
+# topics の uuid → 行番号 の索引を読み直す間隔（秒）
+TOPIC_INDEX_MAX_AGE_SECONDS = float(os.getenv("TOPIC_INDEX_MAX_AGE_SECONDS", "600"))
+# 締切の自動処理で topics を読み直す間隔（秒）
+DEADLINE_RESCAN_SECONDS = float(os.getenv("DEADLINE_RESCAN_SECONDS", "300"))
+# 締切からこの日数がたった終了・削除済みの議題を、投票ごとアーカイブへ移す
+ARCHIVE_AFTER_DAYS = float(os.getenv("ARCHIVE_AFTER_DAYS", "30"))
+# アーカイブ処理を自動で行う間隔（既定の 0 は自動では行わず、archive_old_topics() で手動実行）
+# 行を削除するので、このシートを使うプロセスが 1 つだけの時に設定してください
+ARCHIVE_INTERVAL_SECONDS = float(os.getenv("ARCHIVE_INTERVAL_SECONDS", "0"))
+# 投票の書き込みをまとめる待ち時間（秒）と 1 回にまとめる最大行数
+VOTE_BATCH_WINDOW_SECONDS = float(os.getenv("VOTE_BATCH_WINDOW_SECONDS", "0.5"))
+VOTE_BATCH_MAX_ROWS = int(os.getenv("VOTE_BATCH_MAX_ROWS", "50"))
+# 書き込み待ちにできる投票の上限
+VOTE_QUEUE_MAX = int(os.getenv("VOTE_QUEUE_MAX", "1000"))
+# 議題一覧のライブ更新で、新しい投票を取り込む間隔（秒）
+LIVE_UPDATE_SECONDS = float(os.getenv("LIVE_UPDATE_SECONDS", "5"))
+# 「集計を再計算」で votes を全件読み直せる間隔（秒、プロセス全体で 1 回）
+REBUILD_INTERVAL_SECONDS = float(os.getenv("REBUILD_INTERVAL_SECONDS", "60"))
+# ページ表示時に複数のシートを同時に読み込むスレッド数
+LOAD_WORKERS = 4
+# 投票 1 件の書き込み完了を待つ最大時間（秒）
+VOTE_WRITE_TIMEOUT_SECONDS = 30
+# 投票ジャーナル（スプレッドシートに書き込む前の投票を保存するファイル）
+VOTE_JOURNAL_PATH = os.getenv("VOTE_JOURNAL_PATH", os.path.join(BASE_DIR, "vote_journal.jsonl"))
+# ジャーナルからの書き込みに失敗した時の再試行間隔（秒）の上限
+VOTE_FLUSH_MAX_BACKOFF_SECONDS = 60
+# Sheets API の 1 分あたりの読み込み・書き込み回数の上限（プロジェクトの割り当てに合わせる）
+SHEETS_READ_QUOTA_PER_MINUTE = int(os.getenv("SHEETS_READ_QUOTA_PER_MINUTE", "60"))
+SHEETS_WRITE_QUOTA_PER_MINUTE = int(os.getenv("SHEETS_WRITE_QUOTA_PER_MINUTE", "60"))
+# 起動直後に使う topics / votes のスナップショットの保存先
+SNAPSHOT_DIR = os.getenv("SNAPSHOT_DIR", os.path.join(BASE_DIR, "snapshot"))
+# 差分を読んだ時に votes のスナップショットを保存し直す最短の間隔（秒）
+VOTES_SNAPSHOT_INTERVAL_SECONDS = float(os.getenv("VOTES_SNAPSHOT_INTERVAL_SECONDS", "300"))
+# スプレッドシートの変更チェック（"drive" / "none"）と、その結果を使い回す秒数
+CHANGE_PROBE = os.getenv("CHANGE_PROBE", "drive")
+CHANGE_PROBE_INTERVAL_SECONDS = float(os.getenv("CHANGE_PROBE_INTERVAL_SECONDS", "5"))
+# 429 / 5xx の時に再試行する回数と待ち時間（秒）
+SHEETS_MAX_RETRIES = 5
+SHEETS_BACKOFF_BASE_SECONDS = 1
+SHEETS_BACKOFF_MAX_SECONDS = 32
 
 # ---------------------------------------------------------
-# Googleスプレッドシートに接続する関数
+# 認証情報を読み込む関数
 # ---------------------------------------------------------
-def connect_to_sheet():
-    scope = ['https://spreadsheets.google.com/feeds', 'https://www.googleapis.com/auth/drive']
-    
-    creds = None
+SCOPE = ['https://spreadsheets.google.com/feeds', 'https://www.googleapis.com/auth/drive']
+
+def load_credentials():
     if os.path.exists(KEY_FILE):
         try:
-            creds = ServiceAccountCredentials.from_json_keyfile_name(KEY_FILE, scope)
+            return ServiceAccountCredentials.from_json_keyfile_name(KEY_FILE, SCOPE)
         except Exception as e:
             st.error(f"認証ファイル(key.json)の読み込みエラー: {e}")
             return None
@@ -28,30 +93,1602 @@ def connect_to_sheet():
         try:
             if "gcp_service_account" in st.secrets:
                 key_dict = dict(st.secrets["gcp_service_account"])
-                creds = ServiceAccountCredentials.from_json_keyfile_dict(key_dict, scope)
+                return ServiceAccountCredentials.from_json_keyfile_dict(key_dict, SCOPE)
             else:
                 return None
         except Exception as e:
             st.error(f"Secrets認証情報の読み込みエラー: {e}")
             return None
 
+# ---------------------------------------------------------
+# Sheets API の回数制限（全セッション共通）
+# ---------------------------------------------------------
+# 読み込み・書き込みそれぞれにトークンバケットを用意し、すべての gspread 呼び出しの前に
+# トークンを 1 つ取ります。足りない時は優先度の高い順（数字の小さい順）に待ちます。
+# 優先度はスレッドごとに set_api_priority() で決め、既定は画面表示用です。
+# 優先度の高いスレッドが、ロック（PriorityLock）や実行中の読み込み（SingleFlight）を
+# 持っている低い優先度のスレッドを待っている間は、持っている側がその優先度を引き継ぎます
+# （バックグラウンド処理の後ろで画面表示が待たされる「優先度の逆転」を防ぐため）。
+
+PRIORITY_VOTE = 0         # 投票の書き込み
+PRIORITY_INTERACTIVE = 1  # 画面表示のための読み込みなど
+PRIORITY_BACKGROUND = 2   # 締切処理・再送前の確認などのバックグラウンド処理
+
+_api_context = threading.local()
+
+def set_api_priority(priority):
+    _api_context.priority = priority
+
+def _held_inheritances():
+    # このスレッドが持っている PriorityInheritance（ロック・読み込み）
+    if not hasattr(_api_context, "held"):
+        _api_context.held = []
+    return _api_context.held
+
+def api_priority_getter():
+    """このスレッドの優先度を返す関数を返す（他のスレッドからも呼べます）。
+
+    引き継いだ優先度は呼ぶたびに計算し直します。
+    """
+    base = getattr(_api_context, "priority", PRIORITY_INTERACTIVE)
+    held = _held_inheritances()
+
+    def priority():
+        boosts = [b for b in (h.boost() for h in list(held)) if b is not None]
+        return min([base] + boosts)
+    return priority
+
+def current_api_priority():
+    return api_priority_getter()()
+
+
+class PriorityInheritance:
+    """これを待っているスレッドの優先度を、持ち主のスレッドに引き継ぐ。"""
+
+    def __init__(self):
+        self._guard = threading.Lock()
+        self._waiting = []  # 待っているスレッドの優先度
+
+    def boost(self):
+        with self._guard:
+            return min(self._waiting, default=None)
+
+    @contextlib.contextmanager
+    def waiter(self):
+        priority = current_api_priority()
+        with self._guard:
+            self._waiting.append(priority)
+        try:
+            yield
+        finally:
+            with self._guard:
+                self._waiting.remove(priority)
+
+    @contextlib.contextmanager
+    def owner(self):
+        held = _held_inheritances()
+        held.append(self)
+        try:
+            yield
+        finally:
+            held.remove(self)
+
+
+class PriorityLock(PriorityInheritance):
+    """優先度を引き継ぐロック（with 文で使う）。"""
+
+    def __init__(self):
+        super().__init__()
+        self._lock = threading.Lock()
+
+    def __enter__(self):
+        with self.waiter():
+            self._lock.acquire()
+        _held_inheritances().append(self)
+        return self
+
+    def __exit__(self, *exc_info):
+        _held_inheritances().remove(self)
+        self._lock.release()
+
+
+class RateLimiter:
+    def __init__(self, read_per_minute, write_per_minute):
+        self._cond = threading.Condition()
+        self._rates = {"read": read_per_minute / 60, "write": write_per_minute / 60}
+        self._capacity = {"read": read_per_minute, "write": write_per_minute}
+        self._tokens = dict(self._capacity)
+        self._updated = time.monotonic()
+        self._waiting = {"read": [], "write": []}  # (受付番号, 優先度を返す関数)
+        self._counter = 0
+        self.stats = {"calls": 0, "throttled": 0, "retried": 0, "failed": 0, "probes": 0}
+
+    def _refill(self):
+        now = time.monotonic()
+        elapsed = now - self._updated
+        self._updated = now
+        for kind, rate in self._rates.items():
+            self._tokens[kind] = min(self._capacity[kind], self._tokens[kind] + elapsed * rate)
+
+    def acquire(self, kind, priority=None):
+        """トークンを 1 つ取る。priority を省略するとこのスレッドの優先度（引き継ぎを含む）で待つ。"""
+        if priority is None:
+            get_priority = api_priority_getter()
+        else:
+            get_priority = lambda: priority
+        with self._cond:
+            self._counter += 1
+            ticket = (self._counter, get_priority)
+            waiting = self._waiting[kind]
+            waiting.append(ticket)
+            throttled = False
+            while True:
+                self._refill()
+                # 待っている間に引き継いだ優先度も反映するため、毎回先頭を選び直す
+                head = min(waiting, key=lambda t: (t[1](), t[0]))
+                if head is ticket and self._tokens[kind] >= 1:
+                    waiting.remove(ticket)
+                    self._tokens[kind] -= 1
+                    break
+                throttled = True
+                shortage = max(1 - self._tokens[kind], 0)
+                self._cond.wait(max(shortage / self._rates[kind], 0.05))
+            self.stats["calls"] += 1
+            if throttled:
+                self.stats["throttled"] += 1
+            # 次に並んでいる人を起こす
+            self._cond.notify_all()
+
+    def count(self, name):
+        with self._cond:
+            self.stats[name] += 1
+
+
+@st.cache_resource
+def get_rate_limiter():
+    return RateLimiter(SHEETS_READ_QUOTA_PER_MINUTE, SHEETS_WRITE_QUOTA_PER_MINUTE)
+
+def get_api_stats():
+    """Sheets API 呼び出しの回数（calls / throttled / retried / failed / probes）を返す。"""
+    limiter = get_rate_limiter()
+    with limiter._cond:
+        return dict(limiter.stats)
+
+# ---------------------------------------------------------
+# 接続マネージャー（プロセス全体で1つだけ）
+# ---------------------------------------------------------
+# 認証済みクライアントと Spreadsheet / Worksheet を使い回します。
+# アクセストークンは gspread 内部のセッションが期限切れの時だけ更新するので、
+# 毎回の認証 + Drive 検索（client.open）は不要になります。
+# 認証エラーや通信エラーが起きたら一度だけ接続し直して再実行します。
+
+# 接続し直せば直る可能性があるエラー
+RECONNECT_ERRORS = (
+    google.auth.exceptions.RefreshError,
+    google.auth.exceptions.TransportError,
+    requests.exceptions.ConnectionError,
+    requests.exceptions.Timeout,
+)
+# 認証切れを示す HTTP ステータス
+RECONNECT_STATUS = (401,)
+# 少し待てば成功する可能性がある HTTP ステータス
+RETRYABLE_STATUS = (429, 500, 502, 503, 504)
+# 追記・行の削除など、やり直すと二重になる書き込みで再試行してよいもの
+# （5xx や読み込みのタイムアウトは、サーバー側では反映済みかもしれないので再試行しない）
+UNAPPLIED_STATUS = (429,)
+UNSENT_ERRORS = (
+    google.auth.exceptions.RefreshError,
+    google.auth.exceptions.TransportError,
+    requests.exceptions.ConnectTimeout,
+)
+
+class SheetConnection:
+    def __init__(self, limiter):
+        self.limiter = limiter
+        self._lock = threading.RLock()
+        self._client = None
+        self._sheet = None
+        self._worksheets = {}
+
+    def _connect(self):
+        creds = load_credentials()
+        if creds is None:
+            return None
+        try:
+            self._client = gspread.authorize(creds)
+            self._sheet = self._client.open(SPREADSHEET_NAME)
+        except Exception as e:
+            self._client = None
+            self._sheet = None
+            st.error(f"接続エラー: {e}")
+            return None
+        return self._sheet
+
+    def spreadsheet(self):
+        with self._lock:
+            if self._sheet is None:
+                return self._connect()
+            return self._sheet
+
+    def worksheet(self, name):
+        with self._lock:
+            if name not in self._worksheets:
+                sheet = self.spreadsheet()
+                if sheet is None:
+                    return None
+                self._worksheets[name] = sheet.worksheet(name)
+            return self._worksheets[name]
+
+    def ensure_worksheet(self, name, header):
+        """ワークシート name が無ければ、見出し行 header だけのシートを作る。"""
+        with self._lock:
+            try:
+                return self.worksheet(name)
+            except gspread.exceptions.WorksheetNotFound:
+                pass
+            sheet = self.spreadsheet()
+            if sheet is None:
+                return None
+            self.limiter.acquire("write")
+            worksheet = sheet.add_worksheet(name, rows=1, cols=len(header))
+            self.limiter.acquire("write")
+            worksheet.update([header], "A1")
+            self._worksheets[name] = worksheet
+            return worksheet
+
+    def reset(self):
+        # 次回アクセス時に認証からやり直す
+        with self._lock:
+            self._client = None
+            self._sheet = None
+            self._worksheets = {}
+
+    def call(self, name, func, kind="read", idempotent=True):
+        """ワークシート name に対して func(worksheet) を実行する。
+
+        kind は "read" か "write" で、RateLimiter の対象を選びます。
+        429 / 5xx の時はジッター付きの指数バックオフで再試行し、
+        接続が切れていた場合は一度だけ再接続してやり直します。
+        idempotent が False の書き込み（追記・行の削除）は、届いていないと分かる
+        エラー（429・送る前の認証や接続のエラー）の時だけやり直します。
+        ワークシートが取得できない時は None を返します。
+        """
+        retryable = RETRYABLE_STATUS if idempotent else UNAPPLIED_STATUS
+        for attempt in range(SHEETS_MAX_RETRIES + 1):
+            self.limiter.acquire(kind)
+            try:
+                return self._call_once(name, func, idempotent)
+            except gspread.exceptions.APIError as e:
+                if e.code not in retryable or attempt == SHEETS_MAX_RETRIES:
+                    self.limiter.count("failed")
+                    raise
+            except Exception:
+                self.limiter.count("failed")
+                raise
+            self.limiter.count("retried")
+            backoff = min(SHEETS_BACKOFF_MAX_SECONDS, SHEETS_BACKOFF_BASE_SECONDS * 2 ** attempt)
+            time.sleep(random.uniform(0, backoff))
+
+    def _call_once(self, name, func, idempotent=True):
+        worksheet = self.worksheet(name)
+        if worksheet is None:
+            return None
+        try:
+            return func(worksheet)
+        except gspread.exceptions.APIError as e:
+            if e.code not in RECONNECT_STATUS:
+                raise
+        except RECONNECT_ERRORS as e:
+            if not idempotent and not isinstance(e, UNSENT_ERRORS):
+                raise
+
+        self.reset()
+        worksheet = self.worksheet(name)
+        if worksheet is None:
+            return None
+        return func(worksheet)
+
+
+@st.cache_resource
+def get_connection():
+    return SheetConnection(get_rate_limiter())
+
+# 互換用：Spreadsheet オブジェクトを返す
+def connect_to_sheet():
+    return get_connection().spreadsheet()
+
+# ---------------------------------------------------------
+# スプレッドシートの変更チェック
+# ---------------------------------------------------------
+# キャッシュの TTL が切れても、すぐに全件を読み直さず、まず「前回から変わったか」を
+# 安く調べます。変わっていなければ手元のデータをそのまま使い続けます。
+# version() は変更のたびに変わる値（印）を返し、調べられない時は None を返します。
+# None の時は「変わったかもしれない」として読み直すので、失敗しても古いままにはなりません。
+# テストでは version() を返すだけの偽物に差し替えられます。
+
+class ChangeProbe:
+    def __init__(self, interval=0):
+        self.interval = interval  # この秒数の間は前回の結果を使い回す
+        self._lock = threading.Lock()
+        self._value = None
+        self._checked_at = None
+
+    def version(self):
+        with self._lock:
+            now = time.monotonic()
+            if self._checked_at is None or now - self._checked_at >= self.interval:
+                try:
+                    self._value = self._read_version()
+                except Exception:
+                    self._value = None
+                self._checked_at = now
+            return self._value
+
+    def _read_version(self):
+        return None
+
+
+class DriveChangeProbe(ChangeProbe):
+    """Drive の更新日時（modifiedTime）を印にする。
+
+    シートの値の読み込みより軽く、Sheets API の回数制限にも数えられません。
+    """
+
+    def __init__(self, connection, interval):
+        super().__init__(interval)
+        self.connection = connection
+
+    def _read_version(self):
+        sheet = self.connection.spreadsheet()
+        if sheet is None:
+            return None
+        self.connection.limiter.count("probes")
+        return sheet.get_lastUpdateTime()
+
+
+@st.cache_resource
+def get_change_probe():
+    if CHANGE_PROBE == "drive":
+        return DriveChangeProbe(get_connection(), CHANGE_PROBE_INTERVAL_SECONDS)
+    return ChangeProbe()
+
+# ---------------------------------------------------------
+# ローカルのスナップショット
+# ---------------------------------------------------------
+# 読み込んだ topics / votes をディスクに保存しておき、再起動・再デプロイ直後は
+# Sheets を読まずにここから始めます（起動直後に全員が一斉に全件を読みに行かないように）。
+# データは圧縮なしの Arrow（Feather）形式でメモリマップして読み、
+# 「どの時点のデータか」（変更の印・行数など）は同じ名前の .json に書きます。
+# 保存・読み込みに失敗した場合は、スナップショットが無い時と同じ動きになります。
+
+class TableSnapshot:
+    def __init__(self, directory):
+        self.directory = directory
+        self._lock = threading.Lock()
+
+    def _paths(self, key):
+        base = os.path.join(self.directory, re.sub(r"\W+", "_", key))
+        return base + ".arrow", base + ".json"
+
+    def save(self, key, df, watermark):
+        data_path, meta_path = self._paths(key)
+        try:
+            with self._lock:
+                os.makedirs(self.directory, exist_ok=True)
+                feather.write_feather(df, data_path + ".tmp", compression="uncompressed")
+                with open(meta_path + ".tmp", "w", encoding="utf-8") as f:
+                    json.dump({"key": key, **watermark}, f, ensure_ascii=False)
+                # データ → 透かしの順に置き換える（途中で落ちても透かしが古いだけで済む）
+                os.replace(data_path + ".tmp", data_path)
+                os.replace(meta_path + ".tmp", meta_path)
+        except Exception:
+            pass
+
+    def load_all(self):
+        """保存済みのスナップショットを {key: (DataFrame, 透かし)} で返す。"""
+        snapshots = {}
+        if not os.path.isdir(self.directory):
+            return snapshots
+        for filename in os.listdir(self.directory):
+            if not filename.endswith(".json"):
+                continue
+            try:
+                with open(os.path.join(self.directory, filename), encoding="utf-8") as f:
+                    watermark = json.load(f)
+                data_path = self._paths(watermark["key"])[0]
+                df = feather.read_table(data_path, memory_map=True).to_pandas()
+            except Exception:
+                continue
+            # 文字列の列は Sheets から読んだ時と同じ object 型にそろえる
+            for col in df.columns:
+                if isinstance(df[col].dtype, pd.StringDtype):
+                    df[col] = df[col].astype(object)
+            snapshots[watermark["key"]] = (df, watermark)
+        return snapshots
+
+# ---------------------------------------------------------
+# 同じ読み込みの相乗り（シングルフライト）
+# ---------------------------------------------------------
+# 同じシートの読み込みが実行中なら、後から来た呼び出しは自分では API を呼ばず、
+# 実行中の読み込みの結果を待って受け取ります。
+# キャッシュの TTL が 0 でも、1 つのシートへの同時読み込みは常に 1 本になります。
+# 待っている呼び出しの優先度は、実行中の読み込みに引き継ぎます。
+
+class SingleFlight:
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._calls = {}  # key -> (Future, PriorityInheritance)
+
+    def do(self, key, func):
+        with self._lock:
+            call = self._calls.get(key)
+            leader = call is None
+            if leader:
+                call = (Future(), PriorityInheritance())
+                self._calls[key] = call
+        future, inheritance = call
+        if not leader:
+            with inheritance.waiter():
+                return future.result()
+
+        try:
+            with inheritance.owner():
+                result = func()
+        except BaseException as e:
+            future.set_exception(e)
+            raise
+        else:
+            future.set_result(result)
+            return result
+        finally:
+            with self._lock:
+                del self._calls[key]
+
+# ---------------------------------------------------------
+# 読み込みキャッシュ（全セッション共通）
+# ---------------------------------------------------------
+# topics / votes の DataFrame を TTL の間メモリから返します。
+# このプロセスでの書き込み時には invalidate() で即座に捨てるので、
+# 投票した本人には自分の票がすぐ反映されます。
+# 返す DataFrame は全セッションで共有するので、呼び出し側では変更しないでください。
+# キーはシート名（"topics" など）で、列を絞る時も全列を 1 つだけ持ち、メモリ上で絞ります
+# （絞り方ごとに持つと、書き込みや TTL 切れのたびに同じシートを何度も読むため）。
+# TTL が切れた時は ChangeProbe で変更を確かめ、印が同じなら読み直しません。
+# snapshot を渡すと、読み込んだ内容を保存し、起動時にはそこから復元します。
+
+class TableCache:
+    def __init__(self, ttl, probe=None, snapshot=None):
+        self.ttl = ttl
+        self.probe = probe or ChangeProbe()
+        self.snapshot = snapshot
+        self._lock = threading.Lock()
+        self._entries = {}      # name -> (確認した時刻, DataFrame, 読み込み前の変更の印)
+        self._generations = {}  # name -> invalidate された回数
+        self._flight = SingleFlight()
+        self.restored = []      # スナップショットから復元した name
+        if snapshot is not None:
+            self._restore()
+
+    def _restore(self):
+        now = time.monotonic()
+        for name, (df, watermark) in self.snapshot.load_all().items():
+            self._entries[name] = (now, df, watermark.get("marker"))
+            self.restored.append(name)
+
+    def get(self, name, loader):
+        """キャッシュが有効ならそれを、無ければ loader() の結果を返す。"""
+        with self._lock:
+            entry = self._entries.get(name)
+            generation = self._generations.get(name, 0)
+        if entry is not None and time.monotonic() - entry[0] < self.ttl:
+            return entry[1]
+
+        # 印は読み込みの前に取る（読み込み中の変更は次回の確認で必ず見つかる）
+        version = self.probe.version()
+        if entry is not None and version is not None and version == entry[2]:
+            with self._lock:
+                if self._entries.get(name) is entry:
+                    self._entries[name] = (time.monotonic(), entry[1], version)
+            return entry[1]
+
+        # 書き込み後の読み込みが、書き込み前に始まった読み込みに相乗りしないよう
+        # invalidate の回数もキーに含める
+        df = self._flight.do((name, generation), loader)
+        if df is None:
+            return None
+
+        with self._lock:
+            # 読み込み中に書き込みがあった場合は古いデータなので保存しない
+            stored = self.ttl > 0 and self._generations.get(name, 0) == generation
+            if stored:
+                self._entries[name] = (time.monotonic(), df, version)
+        if stored and self.snapshot is not None:
+            self.snapshot.save(name, df, {"marker": version})
+        return df
+
+    def peek(self, name):
+        """読み込み済みのデータを、TTL や変更に関係なくそのまま返す（無ければ None）。"""
+        with self._lock:
+            entry = self._entries.get(name)
+        return None if entry is None else entry[1]
+
+    def expire(self, name):
+        # データは残したまま、次の get() で変更を確かめさせる
+        with self._lock:
+            entry = self._entries.get(name)
+            if entry is not None:
+                self._entries[name] = (float("-inf"), entry[1], entry[2])
+
+    def invalidate(self, *tables):
+        with self._lock:
+            for name in tables:
+                self._entries.pop(name, None)
+                self._generations[name] = self._generations.get(name, 0) + 1
+
+
+@st.cache_resource
+def get_table_cache():
+    snapshot = TableSnapshot(os.path.join(SNAPSHOT_DIR, "tables"))
+    return TableCache(CACHE_TTL_SECONDS, get_change_probe(), snapshot)
+
+# ---------------------------------------------------------
+# votes の差分同期
+# ---------------------------------------------------------
+# votes シートは append_row で末尾に増えるだけなので、前回読んだ行数を覚えておき
+# 次回は「その次の行から最後まで」（例: A{n+2}:E）だけを取りに行きます。
+# 読み込んだ行は列ごとのリストに追記して保持します。
+# VOTES_FULL_RESYNC_SECONDS ごとに全件を読み直して手作業の編集にも追従します。
+# どちらも ChangeProbe の印が前回と同じなら読みに行きません
+# （このプロセスで書き込んだ直後は印に関係なく読みます）。
+# 読み込んだ内容はスナップショットに保存し、起動時はそこから続きの行だけを読みます。
+# 保存は votes 全体を書き直すので、全件を読んだ時と、差分を読んで snapshot_interval 秒
+# たった時だけ、ロックを放してから行います（保存より後の行は起動時に差分で読みます）。
+
+def _col_letter(col):
+    # 1 -> A, 5 -> E, 27 -> AA
+    return gspread.utils.rowcol_to_a1(1, col)[:-1]
+
+class VoteSync:
+    def __init__(self, connection, full_resync_interval, probe=None, snapshot=None,
+                 snapshot_interval=VOTES_SNAPSHOT_INTERVAL_SECONDS):
+        self.connection = connection
+        self.full_resync_interval = full_resync_interval
+        self.snapshot_interval = snapshot_interval
+        self._saved_at = None    # 最後にスナップショットを保存した時刻
+        self.probe = probe or ChangeProbe()
+        self.snapshot = snapshot
+        # 読み込み中も持つので、待っている画面表示の優先度を引き継ぐ
+        self._lock = PriorityLock()
+        self.header = []
+        self.columns = {}        # 列名 -> 値のリスト
+        self.row_count = 0       # 読み込み済みのデータ行数（ヘッダーを除く）
+        self.last_full_sync = None
+        self.last_sync = None
+        self.listeners = []      # 行が増えた・読み直した時に知らせる相手
+        self._frame = None
+        self._version = 0        # invalidate された回数
+        self.marker = None       # 最後に読み込んだ時の変更の印
+        self._flight = SingleFlight()
+        if snapshot is not None:
+            self._restore()
+
+    def _restore(self):
+        loaded = self.snapshot.load_all().get("votes")
+        if loaded is None:
+            return
+        df, watermark = loaded
+        if len(df) != watermark.get("row_count"):
+            return
+        self.header = watermark["header"]
+        self.columns = {name: df[name].tolist() for name in df.columns}
+        self.row_count = len(df)
+        self.marker = watermark.get("marker")
+        # 次の全件読み直しまでは、保存時点の続きの行だけを読む
+        self.last_full_sync = self.last_sync = self._saved_at = time.monotonic()
+
+    def _snapshot_state(self):
+        # ロック中に呼ぶ。列のリストは追記か丸ごとの置き換えしかされないので、
+        # 行数を覚えておけばロックを放した後でもこの時点の内容を取り出せる
+        return self.columns, self.header, self.row_count, self.marker
+
+    def _save_snapshot(self, state):
+        columns, header, row_count, marker = state
+        self.snapshot.save("votes", pd.DataFrame({
+            name: values[:row_count] for name, values in columns.items()
+        }), {
+            "marker": marker,
+            "header": header,
+            "row_count": row_count,
+        })
+
+    def refresh(self, max_age=0, full=False):
+        """前回から max_age 秒以上たっていれば差分（または全件）を読み込む。
+
+        同時に呼ばれた場合は、実行中の読み込みに相乗りします。
+        """
+        key = (max_age, full, self._version)
+        self._flight.do(key, lambda: self._refresh(max_age, full))
+
+    def _refresh(self, max_age, full):
+        state = self._sync(max_age, full)
+        if state is not None:
+            self._save_snapshot(state)
+
+    def _sync(self, max_age, full):
+        """差分（または全件）を読み込み、スナップショットを保存するならその内容を返す。"""
+        with self._lock:
+            now = time.monotonic()
+            need_full = (
+                full
+                or self.last_full_sync is None
+                or now - self.last_full_sync >= self.full_resync_interval
+            )
+            if not need_full and self.last_sync is not None and now - self.last_sync < max_age:
+                return
+
+            marker = self.probe.version()
+            if (
+                not full
+                and self.last_sync is not None
+                and self.last_full_sync is not None
+                and marker is not None
+                and marker == self.marker
+            ):
+                # 前回から変わっていない
+                if need_full:
+                    self.last_full_sync = now
+                self.last_sync = now
+                return
+
+            row_count = self.row_count
+            if need_full:
+                self._full_sync()
+                self.last_full_sync = now
+            else:
+                self._fetch_new_rows()
+            self.marker = marker
+            self.last_sync = now
+            if self.snapshot is None:
+                return None
+            due = self._saved_at is None or now - self._saved_at >= self.snapshot_interval
+            if need_full or (self.row_count != row_count and due):
+                self._saved_at = now
+                return self._snapshot_state()
+            return None
+
+    def invalidate(self):
+        # 次の refresh() で必ず差分を読みに行く
+        with self._lock:
+            self.last_sync = None
+            self._version += 1
+
+    def rewrite(self, func):
+        """行の削除など、行番号がずれる変更を func() で行う。
+
+        その間は差分の読み込みを止め、次の refresh() では全件を読み直します。
+        """
+        with self._lock:
+            try:
+                return func()
+            finally:
+                self.last_full_sync = None
+                self.last_sync = None
+                self._version += 1
+
+    def frame(self):
+        """読み込み済みの votes を DataFrame で返す（行数が変わった時だけ作り直す）。
+
+        返り値は共有されるので変更しないでください。
+        """
+        with self._lock:
+            if self._frame is None or len(self._frame) != self.row_count:
+                self._frame = frame_from_columns(self.columns)
+            return self._frame
+
+    def _full_sync(self):
+        values = self.connection.call("votes", lambda ws: ws.get_all_values())
+        if values is None:
+            raise ConnectionError("スプレッドシートに接続できません")
+        self.header = values[0] if values else []
+        self.columns = {name: [] for name in self.header if name}
+        self.row_count = 0
+        self._frame = None
+        self._append_rows(values[1:])
+        for listener in self.listeners:
+            listener.votes_reset(frame_from_columns(self.columns))
+
+    def _fetch_new_rows(self):
+        if not self.header:
+            return
+        start = self.row_count + 2  # ヘッダー行の次から
+        cell_range = f"A{start}:{_col_letter(len(self.header))}"
+
+        def _get(ws):
+            try:
+                return ws.get(cell_range)
+            except gspread.exceptions.APIError as e:
+                # 新しい行が無く、シートの最終行を超えた範囲を指定した場合
+                if "exceeds grid limits" in str(e):
+                    return []
+                raise
+
+        rows = self.connection.call("votes", _get)
+        if rows is None:
+            raise ConnectionError("スプレッドシートに接続できません")
+        if rows:
+            records = self._append_rows(rows)
+            for listener in self.listeners:
+                listener.votes_appended(records)
+
+    def _append_rows(self, rows):
+        records = []
+        for row in rows:
+            # 末尾の空セルは API から返ってこないので列数をそろえる
+            row = list(row) + [""] * (len(self.header) - len(row))
+            record = {name: value for name, value in zip(self.header, row) if name}
+            for name, value in record.items():
+                self.columns[name].append(value)
+            records.append(record)
+        self.row_count += len(rows)
+        return records
+
+
+@st.cache_resource
+def get_vote_sync():
+    snapshot = TableSnapshot(os.path.join(SNAPSHOT_DIR, "votes"))
+    return VoteSync(get_connection(), VOTES_FULL_RESYNC_SECONDS, get_change_probe(), snapshot)
+
+# ---------------------------------------------------------
+# topics の uuid → 行番号 の索引
+# ---------------------------------------------------------
+# 締切・削除のたびに topics 全体を読まずに済むよう、uuid 列と owner_email 列だけを
+# 読んで「uuid → (行番号, 作成者メアド)」の索引を作っておきます。
+# 議題の uuid はシート側で付くので、議題を追加した時は索引に「古い」印を付け、
+# 索引に無い uuid を引いた時に読み直します。
+
+class TopicRowIndex:
+    def __init__(self, loader, max_age):
+        self.loader = loader  # uuid / owner_email 列の DataFrame を返す関数
+        self.max_age = max_age
+        # 読み直し中も持つので、待っている画面表示の優先度を引き継ぐ
+        self._lock = PriorityLock()
+        self._rows = {}
+        self._loaded_at = None
+        self._stale = True
+
+    def mark_stale(self):
+        with self._lock:
+            self._stale = True
+
+    def invalidate(self):
+        # 行を削除して行番号がずれた時は、次の lookup() で必ず読み直す
+        with self._lock:
+            self._rows = {}
+            self._loaded_at = None
+
+    def lookup(self, uuid):
+        """(行番号, 作成者メアド) を返す。見つからなければ None。"""
+        uuid = str(uuid)
+        with self._lock:
+            expired = (
+                self._loaded_at is None
+                or time.monotonic() - self._loaded_at >= self.max_age
+            )
+            if expired or (uuid not in self._rows and self._stale):
+                self._refresh()
+            return self._rows.get(uuid)
+
+    def _refresh(self):
+        df = self.loader()
+        self._rows = {
+            str(uuid): (i + 2, str(owner))  # ヘッダー分
+            for i, (uuid, owner) in enumerate(zip(df["uuid"], df["owner_email"]))
+            if str(uuid)
+        }
+        self._loaded_at = time.monotonic()
+        self._stale = False
+
+
+# ---------------------------------------------------------
+# Googleスプレッドシート版ストレージ
+# ---------------------------------------------------------
+# topics は TableCache、votes は VoteSync の差分同期を通して読み込み、
+# 書き込んだらキャッシュを捨てます。
+
+def _project(df, columns):
+    """df から columns の列だけを取り出す（シートに無い列は空の値で補う）。"""
+    if columns is None:
+        return df
+    if set(columns).issubset(df.columns):
+        return df[columns]
+    return df.reindex(columns=columns, fill_value="")
+
+class SheetsBackend(StorageBackend):
+    def __init__(self, connection, cache, vote_sync):
+        self.connection = connection
+        self.cache = cache
+        self.vote_sync = vote_sync
+        self._headers = {}  # シート名 -> 1行目の見出し
+        # アーカイブで行を削除している間は、行番号を使う書き込みを待たせる
+        self._move_lock = PriorityLock()
+        self.topic_rows = TopicRowIndex(
+            lambda: self.read_topics(["uuid", "owner_email"]),
+            TOPIC_INDEX_MAX_AGE_SECONDS,
+        )
+
+    def _call(self, name, func, kind="read", idempotent=True):
+        result = self.connection.call(name, func, kind, idempotent)
+        if result is None:
+            raise ConnectionError("スプレッドシートに接続できません")
+        return result
+
+    def check_vote_header(self):
+        """votes シートの見出しに vote_id 列があることを確かめる。
+
+        vote_id が無いと、同期した投票とジャーナルの投票を見分けられず二重に数えてしまいます。
+        古い 5 列の見出しなら vote_id 列を追加し、それ以外の見出しならエラーにします。
+        """
+        header = self._call("votes", lambda ws: ws.row_values(1))
+        if "vote_id" not in header:
+            if header != VOTE_COLUMNS[:-1]:
+                raise RuntimeError(
+                    f"votes シートの見出しが想定と違います: {header}"
+                    f"（1 行目を {VOTE_COLUMNS} にしてください）"
+                )
+
+            def _add_column(ws):
+                if ws.col_count < len(VOTE_COLUMNS):
+                    ws.add_cols(len(VOTE_COLUMNS) - ws.col_count)
+                return ws.update_acell(f"{_col_letter(len(VOTE_COLUMNS))}1", "vote_id")
+
+            self._call("votes", _add_column, "write")
+            header = list(VOTE_COLUMNS)
+
+        self._headers["votes"] = header
+        # スナップショットの見出しが古い場合は、次回の同期で全件を読み直す
+        if self.vote_sync.header and self.vote_sync.header != header:
+            self.vote_sync.rewrite(lambda: None)
+
+    def _header(self, name):
+        if name not in self._headers:
+            self._headers[name] = self._call(name, lambda ws: ws.row_values(1))
+        return self._headers[name]
+
+    def _column_letter(self, name, column):
+        return _col_letter(self._header(name).index(column) + 1)
+
+    def _read_columns(self, name, columns=None):
+        """必要な列だけを batch_get で読み、列ごとに DataFrame を組み立てる。"""
+        header = self._header(name)
+        columns = columns or [h for h in header if h]
+        present = [c for c in columns if c in header]
+        ranges = []
+        for col in present:
+            letter = _col_letter(header.index(col) + 1)
+            ranges.append(f"{letter}2:{letter}")
+
+        values = {col: [] for col in columns}
+        if ranges:
+            results = self._call(name, lambda ws: ws.batch_get(ranges, major_dimension="COLUMNS"))
+            for col, result in zip(present, results):
+                values[col] = result[0] if result else []
+        return frame_from_columns(values)
+
+    def read_topics(self, columns=None):
+        # 全列を 1 つだけキャッシュし、列はメモリ上で絞る
+        return _project(self.cache.get("topics", lambda: self._read_columns("topics")), columns)
+
+    def cached_topics(self, columns=None):
+        df = self.cache.peek("topics")
+        return None if df is None else _project(df, columns)
+
+    def read_votes(self):
+        self.sync_votes()
+        return self.vote_sync.frame()
+
+    def sync_votes(self, max_age=None):
+        # 既定では CACHE_TTL_SECONDS 以内に読んでいれば何もしない
+        self.vote_sync.refresh(self.cache.ttl if max_age is None else max_age)
+
+    def reload_votes(self):
+        self.vote_sync.refresh(full=True)
+        return self.vote_sync.frame()
+
+    def add_vote_listener(self, listener):
+        self.vote_sync.listeners.append(listener)
+
+    def reconcile_snapshot(self):
+        """スナップショットから復元したデータを Sheets と突き合わせる。
+
+        変更の印が保存時と同じなら読み込まず、votes は続きの行だけを読みます。
+        """
+        if "topics" in self.cache.restored:
+            self.cache.expire("topics")
+            self.read_topics()
+        self.vote_sync.refresh()
+
+    def add_topic(self, row):
+        self._call("topics", lambda ws: ws.append_row(row), "write", idempotent=False)
+        self.cache.invalidate("topics")
+        self.topic_rows.mark_stale()
+
+    def add_votes(self, rows):
+        # 失敗した投票は VoteFlusher が vote_id を確かめてから送り直す
+        self._call("votes", lambda ws: ws.append_rows(rows), "write", idempotent=False)
+        self.vote_sync.invalidate()
+
+    def update_statuses(self, updates, owner_email=None):
+        status_col = self._column_letter("topics", "status")
+        with self._move_lock:
+            # 索引の行番号が古い（行が削除・移動された）場合は、索引を作り直してもう一度
+            for _ in range(2):
+                targets = self._status_targets(updates, owner_email)
+                if not targets or self._rows_hold(targets):
+                    break
+                self.topic_rows.invalidate()
+                # 索引の元になったキャッシュも古いので、シートから読み直させる
+                self.cache.invalidate("topics")
+            else:
+                raise RuntimeError("議題の行の位置が変わったため、ステータスを変更できませんでした")
+
+            if not targets:
+                return []
+
+            # status 列の該当セルだけを batch_update 1 回で書き換える
+            data = [
+                {"range": f"{status_col}{row_number}", "values": [[status]]}
+                for uuid, status, row_number in targets
+            ]
+            self._call("topics", lambda ws: ws.batch_update(data), "write")
+        self.cache.invalidate("topics")
+        return [uuid for uuid, _, _ in targets]
+
+    def _status_targets(self, updates, owner_email):
+        targets = []  # (uuid, 新しいステータス, 行番号)
+        for uuid, status in updates:
+            found = self.topic_rows.lookup(uuid)
+            if found is None:
+                continue
+            row_number, owner = found
+            if owner_email is not None and owner != owner_email:
+                continue
+            targets.append((str(uuid), status, row_number))
+        return targets
+
+    def _rows_hold(self, targets):
+        """書き込む前に、対象の行にまだその uuid があるかを batch_get 1 回で確かめる。"""
+        uuid_col = self._column_letter("topics", "uuid")
+        ranges = [f"{uuid_col}{row_number}" for _, _, row_number in targets]
+        cells = self._call("topics", lambda ws: ws.batch_get(ranges))
+        actual = [str(cell[0][0]) if cell and cell[0] else "" for cell in cells]
+        return actual == [uuid for uuid, _, _ in targets]
+
+    def archive_topics(self, before):
+        with self._move_lock:
+            topic_header, topic_rows = self._read_rows("topics")
+            topics = [dict(zip(topic_header, row)) for row in topic_rows]
+            deadlines = parse_deadline([t.get("deadline", "") for t in topics])
+            moved = {
+                i + 2: row  # ヘッダー分
+                for i, (row, topic, deadline) in enumerate(zip(topic_rows, topics, deadlines))
+                if topic.get("status") in ("closed", "deleted")
+                and pd.notna(deadline) and deadline < before
+            }
+            if not moved:
+                return 0
+            uuids = {topics[row - 2].get("uuid") for row in moved}
+
+            vote_header, vote_rows = self._read_rows("votes")
+            moved_votes = {
+                i + 2: row
+                for i, row in enumerate(vote_rows)
+                if dict(zip(vote_header, row)).get("uuid") in uuids
+            }
+
+            # 先にアーカイブへ書き、その後で元のシートから消す
+            self._append_archive("topics_archive", topic_header, list(moved.values()), "uuid")
+            self._append_archive("votes_archive", vote_header, list(moved_votes.values()), "vote_id")
+            self.vote_sync.rewrite(lambda: self._delete_rows("votes", moved_votes))
+            self._delete_rows("topics", moved)
+            self.topic_rows.invalidate()
+        self.cache.invalidate("topics", "topics_archive", "votes_archive")
+        return len(moved)
+
+    def _read_rows(self, name):
+        values = self._call(name, lambda ws: ws.get_all_values())
+        return (values[0], values[1:]) if values else ([], [])
+
+    def _append_archive(self, name, header, rows, key):
+        if not rows:
+            return
+        if self.connection.ensure_worksheet(name, header) is None:
+            raise ConnectionError("スプレッドシートに接続できません")
+        # 前回の移動が途中で止まっていた場合に、同じ行を二重に書かない
+        # （vote_id 列が無かった頃の行はキーが空なので、見分けられず常に書く）
+        if key in header:
+            existing = set(self._read_columns(name, [key])[key].astype(str))
+            existing.discard("")
+            i = header.index(key)
+            rows = [row for row in rows if not (i < len(row) and row[i] and row[i] in existing)]
+        if rows:
+            self._call(name, lambda ws: ws.append_rows(rows), "write", idempotent=False)
+
+    def _delete_rows(self, name, row_numbers):
+        # 連続した行をまとめ、下の行から順に消す（上の行番号がずれないように）
+        blocks = []
+        for row in sorted(row_numbers, reverse=True):
+            if blocks and blocks[-1][0] == row + 1:
+                blocks[-1][0] = row
+            else:
+                blocks.append([row, row])
+        if not blocks:
+            return
+
+        def _delete(ws):
+            requests = [
+                {"deleteDimension": {"range": {
+                    "sheetId": ws.id,
+                    "dimension": "ROWS",
+                    "startIndex": start - 1,
+                    "endIndex": end,
+                }}}
+                for start, end in blocks
+            ]
+            return ws.spreadsheet.batch_update({"requests": requests})
+
+        self._call(name, _delete, "write", idempotent=False)
+
+    def _read_archive(self, name):
+        try:
+            return self.cache.get(name, lambda: self._read_columns(name))
+        except gspread.exceptions.WorksheetNotFound:
+            # まだ一度もアーカイブしていない
+            return None
+
+    def archived_topics(self, owner_email):
+        df = self._read_archive("topics_archive")
+        if df is None or df.empty or not {"status", "owner_email"}.issubset(df.columns):
+            return empty_topics()
+        return df[
+            (df["status"] == "closed")
+            & (df["owner_email"].astype(str).str.strip() == owner_email)
+        ]
+
+    def archived_votes(self, uuid):
+        df = self._read_archive("votes_archive")
+        if df is None or df.empty or "uuid" not in df.columns:
+            return empty_votes()
+        return df[df["uuid"] == str(uuid)]
+
+    def existing_vote_ids(self, vote_ids):
+        self.vote_sync.refresh()
+        return set(self.vote_sync.columns.get("vote_id", [])) & set(vote_ids)
+
+    def finished_topics(self, owner_email):
+        df = self.read_topics()
+        if df.empty or not {"status", "owner_email"}.issubset(df.columns):
+            return empty_topics()
+
+        return df[
+            # 締切を過ぎた議題は、締切処理が closed にする前でも締切済みとして扱う
+            ((df["status"] == "closed")
+             | ((df["status"] == "active") & (df["deadline"] < pd.Timestamp.now(tz=TIMEZONE))))
+            & (df["owner_email"].astype(str).str.strip() == owner_email)
+        ]
+
+
+# ---------------------------------------------------------
+# 保存先の切り替え（STORAGE_BACKEND）
+# ---------------------------------------------------------
+@st.cache_resource
+def get_backend():
+    if STORAGE_BACKEND == "sqlite":
+        from sqlite_backend import SQLiteBackend
+        return SQLiteBackend(SQLITE_PATH)
+    backend = SheetsBackend(get_connection(), get_table_cache(), get_vote_sync())
+    # votes の見出し（vote_id 列）は、VoteFlusher が最初に書き込む前に裏で確かめる
+    threading.Thread(target=_reconcile_snapshot, args=(backend,), daemon=True).start()
+    return backend
+
+def _reconcile_snapshot(backend):
+    # 起動直後の画面表示はスナップショットで返し、Sheets との突き合わせは裏で行う
+    set_api_priority(PRIORITY_BACKGROUND)
     try:
-        client = gspread.authorize(creds)
-        sheet = client.open(SPREADSHEET_NAME)
-        return sheet
-    except Exception as e:
-        st.error(f"接続エラー: {e}")
+        backend.reconcile_snapshot()
+    except Exception:
+        # 失敗しても、次の読み込み時に通常どおり確かめ直す
+        pass
+
+# ---------------------------------------------------------
+# 投票のまとめ書き
+# ---------------------------------------------------------
+# 投票は 1 件ずつ append_row せず、キューに入れて VOTE_BATCH_WINDOW_SECONDS の間
+# （または VOTE_BATCH_MAX_ROWS 件たまるまで）待ち、append_rows 1 回で書き込みます。
+# submit() は Future を返すので、呼び出し側は自分の 1 票の成功・失敗を受け取れます。
+
+class VoteQueueFullError(Exception):
+    pass
+
+class VoteWriter:
+    def __init__(self, backend, window, max_rows, max_backlog):
+        self.backend = backend
+        self.window = window
+        self.max_rows = max_rows
+        self._queue = queue.Queue(maxsize=max_backlog)
+        self._stopping = threading.Event()
+        self._thread = threading.Thread(target=self._run, name="vote-writer", daemon=True)
+        self._thread.start()
+        atexit.register(self.close)
+
+    def submit(self, row):
+        if self._stopping.is_set():
+            raise RuntimeError("投票の書き込みは停止しています")
+        future = Future()
+        try:
+            self._queue.put_nowait((row, future))
+        except queue.Full:
+            raise VoteQueueFullError("投票が混み合っています。しばらくしてからもう一度お試しください。")
+        return future
+
+    def close(self, timeout=10):
+        """受付を止め、キューに残っている投票をすべて書き込んでから終了する。"""
+        self._stopping.set()
+        self._thread.join(timeout)
+
+    def _run(self):
+        set_api_priority(PRIORITY_VOTE)
+        while not (self._stopping.is_set() and self._queue.empty()):
+            try:
+                batch = [self._queue.get(timeout=0.5)]
+            except queue.Empty:
+                continue
+
+            deadline = time.monotonic() + self.window
+            while len(batch) < self.max_rows:
+                remaining = deadline - time.monotonic()
+                try:
+                    if remaining <= 0 or self._stopping.is_set():
+                        batch.append(self._queue.get_nowait())
+                    else:
+                        batch.append(self._queue.get(timeout=remaining))
+                except queue.Empty:
+                    break
+            self._flush(batch)
+
+    def _flush(self, batch):
+        rows = [row for row, _ in batch]
+        try:
+            self.backend.add_votes(rows)
+        except Exception as e:
+            for _, future in batch:
+                future.set_exception(e)
+            return
+
+        for _, future in batch:
+            future.set_result(True)
+
+
+@st.cache_resource
+def get_vote_writer():
+    return VoteWriter(
+        get_backend(),
+        VOTE_BATCH_WINDOW_SECONDS,
+        VOTE_BATCH_MAX_ROWS,
+        VOTE_QUEUE_MAX,
+    )
+
+# ---------------------------------------------------------
+# 投票ジャーナル（先にローカルへ保存してから送る）
+# ---------------------------------------------------------
+# 投票はまずローカルの追記専用ファイルに書いて fsync し、その時点で完了とします。
+# スプレッドシートへはバックグラウンドの VoteFlusher が VoteWriter 経由で送り、
+# 送れたものには "flushed" の記録を追記します。
+# 再起動時は flushed になっていない投票をもう一度送ります。
+# 送れたかどうか分からない投票（失敗・再起動）は、送る前に votes シートの vote_id と
+# 照らし合わせて二重に書き込まないようにします。
+# 最初に送る前に votes の見出しに vote_id 列があるかを確かめます（無ければ追加）。
+# 起動時に確かめると Sheets が使えない間は画面も出せなくなるので、ここで裏で行います。
+# 直せない見出しの時は送らずに header_error に残し、画面にエラーを出します。
+# 保存先が SQLite の場合も同じ流れで書き込みます。
+
+class VoteJournal:
+    def __init__(self, path):
+        self.path = path
+        self._lock = threading.Lock()
+        self._pending = {}  # vote_id -> 行（送信待ち、追加順）
+        self._replay()
+
+    def _replay(self):
+        if not os.path.exists(self.path):
+            return
+        with open(self.path, encoding="utf-8") as f:
+            for line in f:
+                try:
+                    entry = json.loads(line)
+                except ValueError:
+                    # 書き込み途中で落ちた最終行は読み飛ばす
+                    continue
+                if entry.get("op") == "vote":
+                    self._pending[entry["vote_id"]] = entry["row"]
+                elif entry.get("op") == "flushed":
+                    for vote_id in entry["vote_ids"]:
+                        self._pending.pop(vote_id, None)
+
+    def _write(self, entry):
+        with open(self.path, "a", encoding="utf-8") as f:
+            f.write(json.dumps(entry, ensure_ascii=False) + "\n")
+            f.flush()
+            os.fsync(f.fileno())
+
+    def append(self, vote_id, row):
+        with self._lock:
+            self._write({"op": "vote", "vote_id": vote_id, "row": row})
+            self._pending[vote_id] = row
+
+    def mark_flushed(self, vote_ids):
+        with self._lock:
+            if not vote_ids or not self._pending:
+                return
+            for vote_id in vote_ids:
+                self._pending.pop(vote_id, None)
+            if self._pending:
+                self._write({"op": "flushed", "vote_ids": list(vote_ids)})
+            else:
+                # すべて送り終わったらファイルを空にする
+                with open(self.path, "w", encoding="utf-8") as f:
+                    f.flush()
+                    os.fsync(f.fileno())
+
+    def pending(self):
+        with self._lock:
+            return dict(self._pending)
+
+
+class VoteFlusher:
+    def __init__(self, journal, writer, backend):
+        self.journal = journal
+        self.writer = writer
+        self.backend = backend
+        # 前回の起動から残っていた投票は、送信済みかどうか分からない
+        self._uncertain = set(journal.pending())
+        # VoteWriter に渡して結果がまだ出ていない投票（vote_id -> Future）
+        self._inflight = {}
+        self._header_checked = False
+        self.header_error = None  # 直せない votes の見出しの時の例外
+        self._wake = threading.Event()
+        self._stopping = threading.Event()
+        self._thread = threading.Thread(target=self._run, name="vote-flusher", daemon=True)
+        self._thread.start()
+        atexit.register(self.close)
+
+    def wake(self):
+        self._wake.set()
+
+    def close(self, timeout=5):
+        # 送れなかった投票はジャーナルに残り、次回起動時に再送されます
+        self._stopping.set()
+        self._wake.set()
+        self._thread.join(timeout)
+
+    def _run(self):
+        set_api_priority(PRIORITY_BACKGROUND)
+        backoff = 1
+        while not self._stopping.is_set():
+            if not self._check_header() or (self.journal.pending() and not self._flush_once()):
+                # 失敗したら少しずつ間隔を空けて再試行
+                self._wake.wait(backoff)
+                backoff = min(backoff * 2, VOTE_FLUSH_MAX_BACKOFF_SECONDS)
+            else:
+                backoff = 1
+                self._wake.wait(1)
+            self._wake.clear()
+
+    def _check_header(self):
+        """送る前に保存先の votes の見出しを確かめる。確かめ終わっていれば True を返す。"""
+        if self._header_checked:
+            return True
+        try:
+            self.backend.check_vote_header()
+        except RuntimeError as e:
+            self.header_error = e
+            return False
+        except Exception:
+            # 接続できない間はジャーナルに残したまま、次の回でもう一度確かめる
+            return False
+        self.header_error = None
+        self._header_checked = True
+        return True
+
+    def _flush_once(self):
+        pending = self.journal.pending()
+        # 書き込み中（再試行の待ちを含む）の投票は、結果が出るまで送り直さない
+        for vote_id in self._inflight:
+            pending.pop(vote_id, None)
+
+        if self._uncertain & pending.keys():
+            try:
+                sent = self.backend.existing_vote_ids(pending.keys())
+            except Exception:
+                return False
+            done = [vote_id for vote_id in pending if vote_id in sent]
+            self.journal.mark_flushed(done)
+            self._uncertain -= set(done)
+            for vote_id in done:
+                del pending[vote_id]
+
+        ok = True
+        try:
+            for vote_id, row in pending.items():
+                self._inflight[vote_id] = self.writer.submit(row)
+        except VoteQueueFullError:
+            ok = False
+
+        for vote_id, future in list(self._inflight.items()):
+            try:
+                future.result(timeout=VOTE_WRITE_TIMEOUT_SECONDS)
+            except FutureTimeoutError:
+                # まだ再試行中。Future は残しておき、次の回で結果を確かめる
+                ok = False
+                continue
+            except Exception:
+                self._uncertain.add(vote_id)
+                ok = False
+            else:
+                self.journal.mark_flushed([vote_id])
+                self._uncertain.discard(vote_id)
+            del self._inflight[vote_id]
+        return ok
+
+
+@st.cache_resource
+def get_vote_journal():
+    return VoteJournal(VOTE_JOURNAL_PATH)
+
+@st.cache_resource
+def get_vote_flusher():
+    return VoteFlusher(get_vote_journal(), get_vote_writer(), get_backend())
+
+# ---------------------------------------------------------
+# 集計表（議題ごと・選択肢ごとの票数）
+# ---------------------------------------------------------
+# 票数は表示のたびに votes から数え直さず、プロセス内の集計表を
+# 投票の書き込み時（ジャーナル）と保存先からの同期時に少しずつ更新します。
+# 同じ vote_id は一度しか数えないので、書き込み時と同期時に二重に数えません。
+# 投票者 (uuid, voted_email) の集合も一緒に持ち、投票済みチェックに使います。
+# ずれた時は rebuild_tallies() で全件から作り直せます。
+
+class TallyTable:
+    def __init__(self, journal):
+        self.journal = journal
+        self._lock = threading.Lock()
+        self._tallies = {}     # uuid -> {選択肢: 票数}
+        self._voters = set()   # (uuid, voted_email)
+        self._vote_ids = set() # 数えた vote_id
+        self._rebuild_claimed_at = None
+
+    def _apply(self, record):
+        vote_id = record.get("vote_id", "")
+        if vote_id:
+            if vote_id in self._vote_ids:
+                return
+            self._vote_ids.add(vote_id)
+        uuid = str(record.get("uuid", ""))
+        option = str(record.get("option", ""))
+        options = self._tallies.setdefault(uuid, {})
+        options[option] = options.get(option, 0) + 1
+        self._voters.add((uuid, str(record.get("voted_email", ""))))
+
+    def votes_appended(self, records):
+        with self._lock:
+            for record in records:
+                self._apply(record)
+
+    def votes_reset(self, votes_df):
+        """votes 全体から作り直す（まだ送っていないジャーナルの投票も含める）。"""
+        with self._lock:
+            self._tallies = {}
+            self._voters = set()
+            self._vote_ids = set()
+            for record in votes_df.to_dict("records"):
+                self._apply(record)
+            for row in self.journal.pending().values():
+                self._apply(dict(zip(VOTE_COLUMNS, row)))
+
+    def tally(self, uuid):
+        """{選択肢: 票数} を票数の多い順で返す。"""
+        with self._lock:
+            options = dict(self._tallies.get(str(uuid), {}))
+        return dict(sorted(options.items(), key=lambda item: item[1], reverse=True))
+
+    def has_voted(self, uuid, email):
+        with self._lock:
+            return (str(uuid), email) in self._voters
+
+    def claim_rebuild(self, interval):
+        """前回の作り直しから interval 秒たっていれば True を返し、作り直しの番を取る。"""
+        with self._lock:
+            now = time.monotonic()
+            if self._rebuild_claimed_at is not None and now - self._rebuild_claimed_at < interval:
+                return False
+            self._rebuild_claimed_at = now
+            return True
+
+
+@st.cache_resource
+def get_tally_table():
+    backend = get_backend()
+    table = TallyTable(get_vote_journal())
+    backend.add_vote_listener(table)
+    table.votes_reset(backend.read_votes())
+    return table
+
+# ---------------------------------------------------------
+# 締切の自動処理
+# ---------------------------------------------------------
+# 受付中（active）の議題の締切を最小ヒープに入れておき、締切が来たら
+# その時点で期限切れになった議題をまとめて closed にします（書き込みは 1 回）。
+# これにより各ページは締切日時を毎回比べずに status だけで判断できます。
+# 新しい議題や手作業での変更は DEADLINE_RESCAN_SECONDS ごとの読み直しで拾います。
+
+class DeadlineScheduler:
+    def __init__(self, backend, rescan_interval):
+        self.backend = backend
+        self.rescan_interval = rescan_interval
+        self._lock = threading.Lock()
+        self._heap = []        # (締切の UNIX 時刻, uuid)
+        self._scheduled = {}   # uuid -> 締切の UNIX 時刻
+        self._next_rescan = 0
+        self._wake = threading.Event()
+        self._stopping = threading.Event()
+        self._thread = threading.Thread(target=self._run, name="deadline-scheduler", daemon=True)
+        self._thread.start()
+        atexit.register(self.close)
+
+    def request_rescan(self):
+        with self._lock:
+            self._next_rescan = 0
+        self._wake.set()
+
+    def close(self, timeout=5):
+        self._stopping.set()
+        self._wake.set()
+        self._thread.join(timeout)
+
+    def _active_topics(self):
+        df = self.backend.read_topics(["uuid", "deadline", "status"])
+        return df[(df["status"] == "active") & (df["uuid"] != "")]
+
+    def _rescan(self):
+        active = self._active_topics()
+        with self._lock:
+            for uuid, deadline in zip(active["uuid"], active["deadline"]):
+                if pd.isna(deadline):
+                    continue
+                uuid, due = str(uuid), deadline.timestamp()
+                if self._scheduled.get(uuid) != due:
+                    self._scheduled[uuid] = due
+                    heapq.heappush(self._heap, (due, uuid))
+
+    def _pop_due(self, now):
+        due = []
+        with self._lock:
+            while self._heap and self._heap[0][0] <= now:
+                deadline, uuid = heapq.heappop(self._heap)
+                # 締切が変更された古い予定は捨てる
+                if self._scheduled.get(uuid) == deadline:
+                    del self._scheduled[uuid]
+                    due.append(uuid)
+        return due
+
+    def _close_due(self, due):
+        # その間に削除・締切された議題は触らない
+        active = set(self._active_topics()["uuid"].astype(str))
+        targets = [uuid for uuid in due if uuid in active]
+        if targets:
+            self.backend.update_statuses([(uuid, "closed") for uuid in targets])
+
+    def _run(self):
+        set_api_priority(PRIORITY_BACKGROUND)
+        while not self._stopping.is_set():
+            now = time.time()
+            try:
+                if now >= self._next_rescan:
+                    self._next_rescan = now + self.rescan_interval
+                    self._rescan()
+                due = self._pop_due(now)
+                if due:
+                    self._close_due(due)
+            except Exception:
+                # 失敗したら次の読み直しでもう一度予定を立て直す
+                with self._lock:
+                    self._heap, self._scheduled = [], {}
+                    self._next_rescan = min(self._next_rescan, now + 30)
+
+            with self._lock:
+                wait = self._next_rescan - time.time()
+                if self._heap:
+                    wait = min(wait, self._heap[0][0] - time.time())
+            self._wake.wait(max(wait, 0.1))
+            self._wake.clear()
+
+
+@st.cache_resource
+def get_deadline_scheduler():
+    return DeadlineScheduler(get_backend(), DEADLINE_RESCAN_SECONDS)
+
+# ---------------------------------------------------------
+# 古い議題のアーカイブ
+# ---------------------------------------------------------
+# 締切から ARCHIVE_AFTER_DAYS 日以上たった終了・削除済みの議題を、その投票と一緒に
+# topics_archive / votes_archive へまとめて移します。
+# （いつ締め切られたかは記録していないので、締切日時から数えます）
+# 普段読む topics / votes が小さいままになり、毎回の読み込みが軽くなります。
+# アーカイブは投票結果ページから必要な時だけ読みます。
+# 自動で行う場合も、起動直後の読み込みと重ならないよう最初の 1 回は間隔をあけてから行います。
+
+def archive_cutoff(after_days):
+    return pd.Timestamp.now(tz=TIMEZONE) - pd.Timedelta(days=after_days)
+
+class TopicArchiver:
+    def __init__(self, backend, after_days, interval):
+        self.backend = backend
+        self.after_days = after_days
+        self.interval = interval
+        self._stopping = threading.Event()
+        self._thread = threading.Thread(target=self._run, name="topic-archiver", daemon=True)
+        self._thread.start()
+        atexit.register(self.close)
+
+    def close(self, timeout=5):
+        self._stopping.set()
+        self._thread.join(timeout)
+
+    def _run(self):
+        set_api_priority(PRIORITY_BACKGROUND)
+        while not self._stopping.wait(self.interval):
+            try:
+                self.backend.archive_topics(archive_cutoff(self.after_days))
+            except Exception:
+                # 失敗しても次の回でもう一度行う（移し終えた行は二重に書かない）
+                pass
+
+
+@st.cache_resource
+def get_topic_archiver():
+    if ARCHIVE_INTERVAL_SECONDS <= 0:
         return None
+    return TopicArchiver(get_backend(), ARCHIVE_AFTER_DAYS, ARCHIVE_INTERVAL_SECONDS)
+
+def archive_old_topics(after_days=ARCHIVE_AFTER_DAYS):
+    """締切から after_days 日以上たった終了・削除済みの議題を今すぐアーカイブし、件数を返す。"""
+    try:
+        return get_backend().archive_topics(archive_cutoff(after_days))
+    except Exception as e:
+        st.error(f"アーカイブエラー: {e}")
+        return 0
+
+def get_archived_topics(owner_email):
+    """owner_email が作成した、アーカイブ済みの締切済み議題を返す。"""
+    try:
+        return get_backend().archived_topics(owner_email)
+    except Exception as e:
+        st.error(f"アーカイブ読み込みエラー: {e}")
+        return empty_topics()
+
+def get_archived_tally(uuid):
+    """アーカイブ済みの議題の {選択肢: 票数} を票数の多い順で返す。"""
+    try:
+        votes = get_backend().archived_votes(uuid)
+    except Exception as e:
+        st.error(f"アーカイブ読み込みエラー: {e}")
+        return {}
+    return votes["option"].astype(str).value_counts().to_dict()
 
 # ---------------------------------------------------------
 # 1. 議題を保存する
 # ---------------------------------------------------------
 def add_topic_to_sheet(title, author, options, deadline, owner_email):
-    sheet = connect_to_sheet()
-    if sheet is None: return
-    
     try:
-        worksheet = sheet.worksheet("topics")
         t_delta = datetime.timedelta(hours=9)
         JST = datetime.timezone(t_delta, 'JST')
         created_at = datetime.datetime.now(JST).strftime("%Y-%m-%d %H:%M:%S")
@@ -59,114 +1696,244 @@ def add_topic_to_sheet(title, author, options, deadline, owner_email):
         # タイトル, 作成者, 選択肢, 期限, 作成日, ステータス, 作成者メアド
         new_row = [title, author, options, str(deadline), created_at, "active", owner_email]
         
-        worksheet.append_row(new_row)
+        get_backend().add_topic(new_row)
+        get_deadline_scheduler().request_rescan()
     except Exception as e:
         st.error(f"書き込みエラー: {e}")
 
 # ---------------------------------------------------------
 # 2. 議題を読み込む
 # ---------------------------------------------------------
-def get_topics_from_sheet():
-    sheet = connect_to_sheet()
-    if sheet is None: return pd.DataFrame()
-    
+def get_topics_from_sheet(columns=None):
+    """議題を読み込む。columns を指定するとその列だけを読み込む。
+
+    返り値は全セッションで共有されるので、変更する場合は .copy() してください。
+    """
     try:
-        worksheet = sheet.worksheet("topics")
-        data = worksheet.get_all_records()
-        return pd.DataFrame(data)
+        get_deadline_scheduler()
+        get_topic_archiver()
+        return get_backend().read_topics(columns)
     except Exception as e:
         st.error(f"読み込みエラー: {e}")
-        return pd.DataFrame()
-
+        return empty_topics(columns)
 # ---------------------------------------------------------
 # 3. 投票を保存する（ここを更新！）
 # ---------------------------------------------------------
 # 引数に user_email を追加しました
 def add_vote_to_sheet(topic_title, option, user_email,uuid):
-    sheet = connect_to_sheet()
-    if sheet is None: return
-    
+    """投票をジャーナルに保存する。保存できたら True を返す。
+
+    スプレッドシートへの書き込みはバックグラウンドで行われます。
+    """
     try:
-        worksheet = sheet.worksheet("votes")
+        # 締切後の投票は受け付けない（締切処理が status を closed にする前でも）
+        if not is_topic_open(uuid):
+            st.error("この議題は締め切られているため投票できません。")
+            return False
+
         t_delta = datetime.timedelta(hours=9)
         JST = datetime.timezone(t_delta, 'JST')
         voted_at = datetime.datetime.now(JST).strftime("%Y-%m-%d %H:%M:%S")
+        vote_id = str(uuid_lib.uuid4())
         
-        # ▼▼▼ 最後に user_email を保存します ▼▼▼
-        new_row = [topic_title, option, voted_at, user_email,uuid]
+        # ▼▼▼ user_email の後ろに uuid と vote_id を保存します ▼▼▼
+        new_row = [topic_title, option, voted_at, user_email, str(uuid), vote_id]
         
-        worksheet.append_row(new_row)
+        get_vote_journal().append(vote_id, new_row)
+        get_vote_flusher().wake()
+        get_tally_table().votes_appended([dict(zip(VOTE_COLUMNS, new_row))])
+        return True
     except Exception as e:
         st.error(f"投票書き込みエラー: {e}")
+        return False
+
+def is_topic_open(uuid):
+    """議題 uuid が受付中（status が active で締切前）なら True を返す。
+
+    投票を止めないよう、保存先には問い合わせず読み込み済みの議題で判断します。
+    読み込み済みの議題が無い・見つからない時（追加された直後など）は True を返します。
+    締切の時刻は手元の時計と比べるので、読み込みが古くても締切後の投票は受け付けません。
+    """
+    try:
+        topics = get_backend().cached_topics(["uuid", "deadline", "status"])
+    except Exception:
+        topics = None
+    if topics is None:
+        return True
+    topic = topics[topics["uuid"] == str(uuid)]
+    if topic.empty:
+        return True
+    deadline = topic["deadline"].iloc[0]
+    if pd.notna(deadline) and deadline < pd.Timestamp.now(tz=TIMEZONE):
+        return False
+    return topic["status"].iloc[0] == "active"
 
 # ---------------------------------------------------------
 # 4. 投票数を集計する
 # ---------------------------------------------------------
+def _with_pending_votes(df):
+    """保存先の votes に、まだ保存先に届いていないジャーナルの投票を加える。"""
+    pending = get_vote_journal().pending()
+    if "vote_id" in df.columns:
+        sent = set(df["vote_id"])
+        pending = {k: v for k, v in pending.items() if k not in sent}
+    if pending:
+        pending_df = frame_from_columns(dict(zip(VOTE_COLUMNS, zip(*pending.values()))))
+        df = apply_schema(pd.concat([df.astype(object), pending_df.astype(object)], ignore_index=True))
+    return df
+
 def get_votes_from_sheet():
-    sheet = connect_to_sheet()
-    if sheet is None: return pd.DataFrame()
-    
     try:
-        worksheet = sheet.worksheet("votes")
-        data = worksheet.get_all_records()
-        return pd.DataFrame(data)
+        # 起動直後にジャーナルの残りを再送し始めるため、ここでも起動しておく
+        get_vote_flusher()
+        # まだ保存先に届いていない投票も集計に含める
+        return _with_pending_votes(get_backend().read_votes())
     except Exception as e:
         st.error(f"投票読み込みエラー: {e}")
-        return pd.DataFrame()
+        return empty_votes()
 
+# ---------------------------------------------------------
+# 自分が作成した締切済みの議題
+# ---------------------------------------------------------
+def get_finished_topics(owner_email):
+    try:
+        return get_backend().finished_topics(owner_email)
+    except Exception as e:
+        st.error(f"読み込みエラー: {e}")
+        return empty_topics()
 
-#---------------------------------------------------------
-#    議題の論理削除
-#---------------------------------------------------------
-def delete_topic_by_uuid(uuid, owner_email):
-    sheet = connect_to_sheet()
-    if sheet is None:
-        return False
 
+# ---------------------------------------------------------
+# 集計表を読む
+# ---------------------------------------------------------
+def get_tallies():
+    """新しい投票を取り込んだうえで集計表（TallyTable）を返す。"""
     try:
-        worksheet = sheet.worksheet("topics")
-        records = worksheet.get_all_records()
-        df = pd.DataFrame(records)
+        get_vote_flusher()
+        table = get_tally_table()
+        get_backend().sync_votes()
+    except Exception as e:
+        st.error(f"投票読み込みエラー: {e}")
+        table = TallyTable(get_vote_journal())
+    return table
 
-        target = df[
-            (df["uuid"] == uuid) &
-            (df["owner_email"] == owner_email)
-        ]
+def poll_tallies(max_age=LIVE_UPDATE_SECONDS):
+    """ライブ更新用：増えた投票の差分だけを取り込んで集計表を返す。
 
-        if target.empty:
-            return False
+    取り込みは max_age 秒に 1 回までで、開いているタブがいくつあっても
+    プロセス全体で 1 回の小さな読み込みにまとまります。
+    """
+    table = get_tally_table()
+    try:
+        get_backend().sync_votes(max_age)
+    except Exception:
+        # 取り込めなかった時は手元の集計をそのまま表示し、次の回に取り込む
+        pass
+    return table
 
-        row_number = target.index[0] + 2  # ヘッダー分
+def rebuild_tallies():
+    """保存先の votes を全件読み直して集計表を作り直す。
 
-        # status 列（6列目）を deleted に
-        worksheet.update_cell(row_number, 6, "deleted")
+    全件の読み込みは重いので、REBUILD_INTERVAL_SECONDS 秒に 1 回まで（プロセス全体）にします。
+    """
+    try:
+        table = get_tally_table()
+        if not table.claim_rebuild(REBUILD_INTERVAL_SECONDS):
+            st.warning("集計は少し前に作り直したばかりです。しばらくしてからもう一度お試しください。")
+            return False
+        table.votes_reset(get_backend().reload_votes())
         return True
-
     except Exception as e:
-        st.error(f"削除エラー: {e}")
+        st.error(f"集計の再計算エラー: {e}")
         return False
 
 
 # ---------------------------------------------------------
-# 5. ステータスを終了にする
+# 複数のデータをまとめて（同時に）読み込む
 # ---------------------------------------------------------
-def close_topic_status(topic_title):
-    try:
-        sheet = connect_to_sheet()
-        if sheet is None: return
+# topics と votes を順番に読むと待ち時間は 2 回分の合計になるので、
+# 小さなスレッドプールで同時に読み、一番遅い 1 回分で済むようにします。
 
-        worksheet = sheet.worksheet("topics")
-        cell = worksheet.find(topic_title)
-        # F列(6列目)を closed に書き換える
-        worksheet.update_cell(cell.row, 6, "closed")
-        
+@st.cache_resource
+def get_load_executor():
+    return ThreadPoolExecutor(max_workers=LOAD_WORKERS, thread_name_prefix="db-load")
+
+def _load_tallies():
+    table = get_tally_table()
+    get_backend().sync_votes()
+    return table
+
+def load_tables(names, topic_columns=None, owner_email=None):
+    """names に挙げたデータを同時に読み込み、(結果, エラー) の dict を返す。
+
+    names に使えるもの:
+      "topics"          … get_topics_from_sheet(topic_columns) と同じ DataFrame
+      "votes"           … get_votes_from_sheet() と同じ DataFrame（ジャーナルの未送信分を含む）
+      "tallies"         … get_tallies() と同じ集計表
+      "finished_topics" … get_finished_topics(owner_email) と同じ DataFrame
+    エラーになったものは結果に空のデータが入り、エラーの dict に名前ごとの例外が入ります。
+    """
+    fallbacks = {
+        "topics": lambda: empty_topics(topic_columns),
+        "votes": empty_votes,
+        "tallies": lambda: TallyTable(get_vote_journal()),
+        "finished_topics": empty_topics,
+    }
+
+    try:
+        backend = get_backend()
+        flusher = get_vote_flusher()
+        if flusher.header_error is not None:
+            raise flusher.header_error
+        get_deadline_scheduler()
+        get_topic_archiver()
     except Exception as e:
-        st.error(f"ステータス更新エラー: {e}")
+        # 保存先が使えない（votes の見出しが違う等）時は、すべて同じエラーにする
+        return {name: fallbacks[name]() for name in names}, {name: e for name in names}
 
+    loaders = {
+        "topics": lambda: backend.read_topics(topic_columns),
+        "votes": lambda: _with_pending_votes(backend.read_votes()),
+        "tallies": _load_tallies,
+        "finished_topics": lambda: backend.finished_topics(owner_email),
+    }
 
+    executor = get_load_executor()
+    futures = {name: executor.submit(loaders[name]) for name in names}
+    results, errors = {}, {}
+    for name, future in futures.items():
+        try:
+            results[name] = future.result()
+        except Exception as e:
+            errors[name] = e
+            results[name] = fallbacks[name]()
+    return results, errors
 
 
+# ---------------------------------------------------------
+# ステータスの一括変更
+# ---------------------------------------------------------
+def update_topic_statuses(updates, owner_email=None):
+    """(uuid, 新しいステータス) の組をまとめて書き込み、変更できた uuid のリストを返す。
+
+    owner_email を指定した場合はその人が作成した議題だけを変更します。
+    """
+    try:
+        return get_backend().update_statuses(list(updates), owner_email)
+    except Exception as e:
+        st.error(f"ステータス更新エラー: {e}")
+        return []
 
 
+#---------------------------------------------------------
+#    議題の論理削除
+#---------------------------------------------------------
+def delete_topic_by_uuid(uuid, owner_email):
+    return bool(update_topic_statuses([(uuid, "deleted")], owner_email))
 
 
+# ---------------------------------------------------------
+# 5. ステータスを終了にする
+# ---------------------------------------------------------
+def close_topic_status(uuid):
+    update_topic_statuses([(uuid, "closed")])
@@ -1,6 +1,5 @@
 import streamlit as st
 import pandas as pd
-import time
 import datetime
 import sys
 import os
@@ -53,71 +52,47 @@ with col4:
     st.write("")
     if st.button("⬇️ 降順"): st.session_state.fg = 1
 
+live_mode = st.toggle("📡 投票数をライブ更新する", help="開いている間、投票数が自動で更新されます")
+
 # ---------------------------------------------------------
 # データ取得（ここを修正！）
 # ---------------------------------------------------------
 
-# ▼▼▼ 修正1：キャッシュを削除（ttl設定を消すのではなく、デコレータ自体を消す） ▼▼▼
-# 学校の課題レベルのアクセス数なら、キャッシュなし(毎回読み込み)でもAPI制限には引っかかりにくいです。
-# 安全策としてキャッシュを使わず、確実に最新データを取ります。
+# キャッシュは db_handler 側で全セッション共通にしています（CACHE_TTL_SECONDS）。
+# 投票・作成・締切・削除をするとすぐに捨てられるので、自分の操作は即座に反映されます。
 
-def load_topics():
-    df = db_handler.get_topics_from_sheet()
-    
-    # データの「型」をすべて「文字(str)」に統一します（これが重要！）
-    # 数字の「1」と文字の「1」が違うせいで判定ミスするのを防ぎます
-    df = df.astype(str)
-    
-    # 列がない場合のエラー回避
-    if "owner_email" not in df.columns:
-        df["owner_email"] = ""
-    
-    return df
+# このページで使う列だけを読み込みます。
+# 値はすべて文字列で、deadline は日本時間の日時に変換済みです（db_handler 側で一度だけ）。
+# topics_df は他のセッションと共有しているので、ここでは変更しません。
+TOPIC_COLUMNS = ["title", "author", "options", "deadline", "status", "owner_email", "uuid"]
 
-topics_df = load_topics()
+# 議題ごとの票数と投票者は db_handler の集計表から引きます（votes は読み直しません）
+# topics と集計表は同時に読み込みます。
+loaded, load_errors = db_handler.load_tables(["topics", "tallies"], topic_columns=TOPIC_COLUMNS)
+for name, error in load_errors.items():
+    st.error(f"{name} の読み込みエラー: {error}")
+
+topics_df = loaded["topics"]
+tallies = loaded["tallies"]
 
 if topics_df.empty:
     st.info("まだ議題が登録されていません。")
     st.stop()
 
-def load_votes():
-    df = db_handler.get_votes_from_sheet()
-    
-    # こちらもすべてのデータを「文字(str)」に統一
-    df = df.astype(str)
-    
-    if "voted_email" not in df.columns:
-        df["voted_email"] = ""
-    if "topic_title" not in df.columns:
-        df["topic_title"] = ""
-    
-    return df
-
-votes_df = load_votes()
-
 # ---------------------------------------------------------
 # データ加工
 # ---------------------------------------------------------
-now = pd.Timestamp.now(tz="Asia/Tokyo")
-
-topics_df["deadline"] = (
-    pd.to_datetime(
-        topics_df["deadline"],
-        errors="coerce",
-        format="%Y-%m-%d %H:%M"
-    )
-    .dt.tz_localize("Asia/Tokyo")
-)
-
-display_df = topics_df.copy()
+now = pd.Timestamp.now(tz=db_handler.TIMEZONE)
 
 # 締め切りフィルタ
+# （締切を過ぎた議題は db_handler の締切処理が closed にしますが、
+#   それより前に表示した時のために締切もここで確かめます）
 display_df = topics_df[
     topics_df["deadline"].isna() |
     (topics_df["deadline"] >= now)
 ]
 
-# 削除済み除外
+# 削除済み除外（作成者が早めに締め切った議題は「受付終了」で表示します）
 display_df = display_df[display_df["status"] != "deleted"]
 
 # uuid 不正除外
@@ -146,10 +121,59 @@ if my_only:
         st.info("あなたが作成した議題はありません。")
         st.stop()
 
+# ---------------------------------------------------------
+# 投票数のライブ更新
+# ---------------------------------------------------------
+# タイマーはタブごとに 1 つだけです（カードごとには持ちません）。
+# LIVE_UPDATE_SECONDS ごとに増えた投票の差分を取り込み（プロセス全体で 1 回にまとまります）、
+# 表示中の議題の票数が前回から変わった時だけページを描き直します。
+def tally_snapshot(table, uuids):
+    return {uuid: table.tally(uuid) for uuid in uuids}
+
+@st.fragment(run_every=db_handler.LIVE_UPDATE_SECONDS)
+def watch_tallies(uuids):
+    snapshot = tally_snapshot(db_handler.poll_tallies(), uuids)
+    if snapshot != st.session_state.live_tallies:
+        st.session_state.live_tallies = snapshot
+        st.rerun()
+
+if live_mode:
+    uuids = [str(uuid) for uuid in display_df["uuid"]]
+    # 今回描く票数を覚えておき、変わった時だけ watch_tallies が描き直す
+    st.session_state.live_tallies = tally_snapshot(tallies, uuids)
+    watch_tallies(uuids)
+
+# ---------------------------------------------------------
+# 投票数の表示
+# ---------------------------------------------------------
+def render_tally(options_raw, uuid):
+    st.write("### 📊 現在の投票数")
+    # 票数の多い順の {選択肢: 票数}
+    counts = tallies.tally(uuid)
+
+    if options_raw == "FREE_INPUT":
+        if not counts:
+            st.write("まだ投票はありません")
+        else:
+            for opt, count in counts.items():
+                st.write(f"・{opt}：{count} 票")
+    else:
+        try:
+            options = str(options_raw).split("/")
+        except:
+            options = []
+
+        for opt in options:
+            st.write(f"{opt}：{counts.get(opt, 0)} 票")
+
 # ---------------------------------------------------------
 # 議題ループ表示
 # ---------------------------------------------------------
-for index, topic in display_df.iterrows():
+# 議題カードは 1 枚ずつフラグメントにしています。
+# 投票するとそのカードだけを描き直し、シートの読み直しや他のカードの再描画はしません。
+# （集計表は投票時にすぐ更新されるので、カードを描き直すだけで票数に反映されます）
+@st.fragment
+def render_topic_card(index, topic):
     title = topic["title"]
     author = topic.get("author", "不明")
     options_raw = topic["options"]
@@ -164,20 +188,9 @@ for index, topic in display_df.iterrows():
 
     is_closed = (status == 'closed')
     
-    # ▼▼▼ 重複投票チェック（シンプルかつ確実な比較） ▼▼▼
-    has_voted = False
-    
-    # 1. データ上のチェック
-    if not votes_df.empty:
-        # タイトルも「文字」同士で比較
-        this_topic_votes = votes_df[votes_df["uuid"] == str(topic["uuid"])]
-        
-        # 投票者リストを取得（すでにstr変換済みなのでそのままリスト化）
-        voter_list = this_topic_votes["voted_email"].tolist()
-        
-        # 完全に一致するかチェック
-        if current_user in voter_list:
-            has_voted = True
+    # ▼▼▼ 重複投票チェック ▼▼▼
+    # 1. データ上のチェック（(uuid, 投票者) の集合を引くだけ）
+    has_voted = tallies.has_voted(topic["uuid"], current_user)
     
     # 2. 直前の操作履歴チェック
     if str(topic["uuid"]) in st.session_state.just_voted_topics:
@@ -196,7 +209,7 @@ for index, topic in display_df.iterrows():
              with st.popover("⚠️ 投票を締め切る"):
                 st.write("本当に終了しますか？")
                 if st.button("はい、終了します", key=f"close_{index}", type="primary"):
-                    db_handler.close_topic_status(title)
+                    db_handler.close_topic_status(topic["uuid"])
                     st.success("終了しました！")
                     st.rerun()
 
@@ -234,38 +247,19 @@ for index, topic in display_df.iterrows():
                     if not submit_value:
                         st.error("回答を入力してください")
                     else:
-                        db_handler.add_vote_to_sheet(title, submit_value, current_user,topic["uuid"])
-                        st.session_state.just_voted_topics.append(topic["uuid"])
-                        st.success("投票しました！")
-                        time.sleep(3)
-                        st.rerun()
+                        if db_handler.add_vote_to_sheet(title, submit_value, current_user,topic["uuid"]):
+                            st.session_state.just_voted_topics.append(str(topic["uuid"]))
+                            st.toast("投票しました！", icon="✅")
+                            # このカードだけを描き直す
+                            st.rerun(scope="fragment")
 
         # 右カラム：投票数集計表示
         with col2:
-            st.write("### 📊 現在の投票数")
-            # タイトルも文字型で比較して抽出
-            topic_votes = votes_df[votes_df["uuid"] == str(topic["uuid"])] if not votes_df.empty else pd.DataFrame()
-            
-            if options_raw == "FREE_INPUT":
-                if topic_votes.empty:
-                    st.write("まだ投票はありません")
-                else:
-                    counts = topic_votes["option"].value_counts()
-                    for opt, count in counts.items():
-                        st.write(f"・{opt}：{count} 票")
-            else:
-                try:
-                    options = str(options_raw).split("/")
-                except:
-                    options = []
-
-                if topic_votes.empty:
-                    for opt in options:
-                        st.write(f"{opt}：0 票")
-                else:
-                    counts = topic_votes["option"].value_counts()
-                    for opt in options:
-                        st.write(f"{opt}：{counts.get(opt, 0)} 票")
+            render_tally(options_raw, topic["uuid"])
+
+
+for index, topic in display_df.iterrows():
+    render_topic_card(index, topic)
 
 
 
@@ -5,14 +5,8 @@ import time
 import sys
 import os
 from background import set_background  #  # 背景画像の設定ファイルをインポート
-from google import genai # gemini api
-
-# 環境変数から API キーを取得
-API_KEY = os.getenv('GEMINI_API_KEY')
-
-# Gemini クライアント初期化
-client = genai.Client(api_key=API_KEY)
-
+# Gemini の SDK は分析ボタンを押した時に初めて読み込みます（ai_analysis）
+import ai_analysis
 
 # db_handler.py を読み込めるようにパスを通す
 sys.path.append(os.path.abspath(os.path.dirname(__file__) + '/..'))
@@ -37,47 +31,34 @@ if "logged_in_user" not in st.session_state or st.session_state.logged_in_user i
     st.stop() # ← ここで読み込みを強制ストップします
 # ---------------------------------------------------------
 
-# データ取得
-topics_df = db_handler.get_topics_from_sheet()
-votes_df = db_handler.get_votes_from_sheet()
-
-
-# 日付変換
-if not topics_df.empty and "deadline" in topics_df.columns:
-    topics_df["deadline_parsed"] = pd.to_datetime(
-        topics_df["deadline"], errors="coerce"
-    )
-    
-
-
-# 今日の日付
-now = pd.Timestamp.now(tz="Asia/Tokyo").tz_localize(None)
-
-
-
-
-
 # ログインユーザー
 current_user = str(st.session_state.logged_in_user).strip()
 
-# 締切済み ＋ 自分が作成した議題のみ抽出
-if (
-    not topics_df.empty
-    and {"deadline_parsed", "status", "owner_email"}.issubset(topics_df.columns)
-):
-    finished_topics = topics_df[
-        (
-            (
-                topics_df["deadline_parsed"].notna()
-                & (topics_df["deadline_parsed"] < now)
-            )
-            | (topics_df["status"] == "closed")
-        )
-        & (topics_df["owner_email"].astype(str).str.strip() == current_user)
-        & (topics_df["status"] != "deleted")  # ← 論理削除済みを除外
-    ].copy()
-else:
-    finished_topics = pd.DataFrame()
+# データ取得
+# 締切済み ＋ 自分が作成した議題のみ抽出（論理削除済みは除外）
+# 議題と集計表は同時に読み込みます
+# （一括操作用に、自分の議題の一覧も一緒に読み込みます）
+loaded, load_errors = db_handler.load_tables(
+    ["finished_topics", "tallies", "topics"],
+    topic_columns=["title", "status", "owner_email", "uuid"],
+    owner_email=current_user,
+)
+for name, error in load_errors.items():
+    st.error(f"{name} の読み込みエラー: {error}")
+
+finished_topics = loaded["finished_topics"].copy()
+tallies = loaded["tallies"]
+all_topics = loaded["topics"]
+
+# 締切から時間がたった議題はアーカイブに移されるので、見たい時だけ読み込みます
+show_archive = st.checkbox("📦 アーカイブ済みの議題も表示する")
+archived_uuids = set()
+if show_archive:
+    archived_topics = db_handler.get_archived_topics(current_user)
+    archived_uuids = set(archived_topics["uuid"].astype(str))
+    finished_topics = pd.concat(
+        [finished_topics.astype(object), archived_topics.astype(object)], ignore_index=True
+    )
 
 
 # 議題ドロップダウン
@@ -89,7 +70,6 @@ else:
 selected_topic = st.selectbox("議題を選択してください", topic_titles)
 result_df = pd.DataFrame()
 options = None
-topic_votes = pd.DataFrame()
 result_df = pd.DataFrame()
 # 表示処理
 if finished_topics.empty or selected_topic == "（締切済みの議題がありません）":
@@ -99,10 +79,12 @@ else:
     topic_row = finished_topics[finished_topics["title"] == selected_topic].iloc[0]
     options = topic_row["options"].split("/")
 
-    topic_votes = (
-        votes_df[votes_df["topic_title"] == selected_topic]
-        if not votes_df.empty else pd.DataFrame()
-    )
+    # 票数は集計表から直接読む（{選択肢: 票数}、票数の多い順）
+    # アーカイブ済みの議題はアーカイブの投票から数える
+    if str(topic_row["uuid"]) in archived_uuids:
+        counts = db_handler.get_archived_tally(topic_row["uuid"])
+    else:
+        counts = tallies.tally(topic_row["uuid"])
 
     st.subheader(f"📝 議題：{selected_topic}")
 
@@ -113,8 +95,7 @@ else:
         st.stop()
     else:
         if options == ["FREE_INPUT"]:
-            # 自由入力の場合は votes_df の option 列を選択肢として集計
-            counts = topic_votes["option"].value_counts() if not topic_votes.empty else {}
+            # 自由入力の場合は投票された回答をそのまま選択肢として集計
             for opt, cnt in counts.items():
                 result.append({
                     "選択肢": opt,
@@ -122,7 +103,6 @@ else:
                 })
         else:
             # 通常の選択肢の場合
-            counts = topic_votes["option"].value_counts() if not topic_votes.empty else {}
             for opt in options:
                 result.append({
                     "選択肢": opt,
@@ -140,6 +120,7 @@ if not finished_topics.empty and selected_topic in finished_topics["title"].valu
 else:
     topic_uuid = None
 
+
 if not result_df.empty:
     
     # 円グラフ
@@ -152,8 +133,18 @@ if not result_df.empty:
     st.plotly_chart(fig_pie)
 
 
+# 集計の再計算（票数がシートとずれた時の修復用）
+# votes を全件読み直すので、自分の議題を選んでいる作成者にだけ出します
+# （db_handler 側でもプロセス全体で REBUILD_INTERVAL_SECONDS 秒に 1 回までにしています）
+if topic_uuid is not None and st.button("🔄 集計を再計算"):
+    if db_handler.rebuild_tallies():
+        st.success("集計を作り直しました。")
+        st.rerun()
+
 # 削除ボタン
-if st.button("🗑️ 議題を削除") and topic_uuid:
+# アーカイブ済みの議題は削除の対象外
+can_delete = topic_uuid is not None and str(topic_uuid) not in archived_uuids
+if st.button("🗑️ 議題を削除") and can_delete:
     deleted = db_handler.delete_topic_by_uuid(topic_uuid, current_user)
     if deleted:
         st.success(f"「{selected_topic}」を削除しました。")
@@ -163,6 +154,46 @@ if st.button("🗑️ 議題を削除") and topic_uuid:
         st.error("削除できませんでした（権限がないか既に削除済み）")
 
 
+# =============================
+# 自分の議題の一括操作
+# =============================
+my_topics = all_topics[
+    (all_topics["owner_email"].astype(str).str.strip() == current_user)
+    & (all_topics["status"] != "deleted")
+]
+if not my_topics.empty:
+    with st.expander("🗂️ 自分の議題をまとめて操作する"):
+        labels = {
+            str(row["uuid"]): f"{row['title']}（{'終了' if row['status'] == 'closed' else '受付中'}）"
+            for _, row in my_topics.iterrows()
+        }
+        selected_uuids = st.multiselect(
+            "議題を選択してください",
+            list(labels),
+            format_func=lambda uuid: labels[uuid],
+        )
+
+        bulk_col1, bulk_col2 = st.columns(2)
+        bulk_status = None
+        with bulk_col1:
+            if st.button("⛔ まとめて締め切る", disabled=not selected_uuids, use_container_width=True):
+                bulk_status = "closed"
+        with bulk_col2:
+            if st.button("🗑️ まとめて削除", disabled=not selected_uuids, use_container_width=True):
+                bulk_status = "deleted"
+
+        if bulk_status:
+            # 選んだ議題のステータスを 1 回の書き込みで変更する
+            updated = db_handler.update_topic_statuses(
+                [(uuid, bulk_status) for uuid in selected_uuids], current_user
+            )
+            if updated:
+                st.toast(f"{len(updated)} 件の議題を更新しました。")
+                st.rerun()
+            else:
+                st.warning("更新できた議題はありませんでした。")
+
+
 
     
 # =============================
@@ -171,51 +202,22 @@ if st.button("🗑️ 議題を削除") and topic_uuid:
 st.divider()
 st.subheader("🔍 Geminiによる投票結果分析")
 if st.button("🧠AIに分析してもらう"):
-    with st.spinner("Gemini が分析中です..."):
-
-        analysis_prompt = f"""
-# 命令: あなたは厳格で経験豊富なデータアナリストです。
-以下の「制約事項」と「出力テンプレート」を**一言一句厳守**し、提供されたCSVデータを分析してください。
-
-# 制約事項 (重要)
-1. **生データの隠蔽**: 入力されたCSVデータ自体は、回答に**絶対に**含めないでください。
-2. **フォーマット厳守**: 以下の「出力テンプレート」の構造、見出し、箇条書きのスタイルを崩さないでください。
-3. **可読性向上**: 重要な数値（得票数やパーセンテージ）やキーワードは **太字** で強調してください。
-4. **客観性**: 主観的な感想は排除し、データに基づいた事実と論理的な推測のみを記述してください。
-5. **テンプレート外禁止**: テンプレートに書かれていない文言は**絶対に出力しない**でください。
-6. **終了条件**: 出力はテンプレートの最終行までで終了すること。
-
-# 出力テンプレート
----
-## 📊 分析概要
-（ここに、データ全体から読み取れる最も重要な結論を2〜3行で簡潔に記述。）
-
-## 📈 投票傾向
-- **（傾向の要約1）**: （具体的な数値を用いる）
-- **（傾向の要約2）**
-- **（傾向の要約3）**
-
-## 🧠 支持理由の推測
-- **（推測される理由1）**
-- **（推測される理由2）**
-
-## 🔍 全体の特徴・特異点
-- （分布の特徴）
-- （特筆すべき点）
-
-# 解析対象データ
-議題:{selected_topic}
-CSVデータ:{result_df.to_csv(index=False)}
-"""
-
-        response = client.models.generate_content(
-            model="gemini-2.5-flash",
-            contents=analysis_prompt
-        )
-
-      
-        st.markdown(response.text)
-        #st.write(response.text)
+    try:
+        # 届いた部分から順に表示する
+        # （同じ集計の分析は保存済みの結果を返し、AI は呼ばない）
+        # （自由回答は表記ゆれをまとめ、多い時は分けて要約してから分析する）
+        progress = st.empty()
+        st.write_stream(ai_analysis.get_analysis_service().analyze_stream(
+            selected_topic, result_df, uuid=topic_uuid, free_input=(options == ["FREE_INPUT"]),
+            on_progress=lambda done, total: progress.progress(
+                done / total, text=f"回答を {total} つに分けて要約しています…（{done}/{total}）"
+            ),
+        ))
+        progress.empty()
+    except TimeoutError:
+        st.error("分析に時間がかかりすぎたため中断しました。もう一度お試しください。")
+    except Exception as e:
+        st.error(f"分析エラー: {e}")
 
 
 
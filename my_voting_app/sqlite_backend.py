@@ -0,0 +1,184 @@
+import sqlite3
+import threading
+import uuid as uuid_lib
+
+import pandas as pd
+
+from storage import (
+    DEADLINE_FORMAT, StorageBackend, TIMEZONE, TOPIC_COLUMNS, VOTE_COLUMNS, frame_from_columns,
+)
+
+# ---------------------------------------------------------
+# SQLite 版ストレージ
+# ---------------------------------------------------------
+# Sheets API の回数制限を受けずに動かしたい時や、オフラインで試したい時に使います。
+# WAL モードにして、読み込み中でも書き込みが待たされないようにしています。
+# 「議題ごとの投票」「自分の締切済みの議題」はインデックスで引きます。
+# deadline は "YYYY-MM-DD HH:MM" の文字列なので、そのまま大小比較・並び替えできます。
+# 古い議題と投票は同じ形の topics_archive / votes_archive テーブルへ移します。
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS topics (
+    row_id      INTEGER PRIMARY KEY,
+    title       TEXT NOT NULL,
+    author      TEXT NOT NULL DEFAULT '',
+    options     TEXT NOT NULL,
+    deadline    TEXT NOT NULL DEFAULT '',
+    created_at  TEXT NOT NULL,
+    status      TEXT NOT NULL DEFAULT 'active',
+    owner_email TEXT NOT NULL DEFAULT '',
+    uuid        TEXT NOT NULL UNIQUE
+);
+CREATE INDEX IF NOT EXISTS idx_topics_owner_email ON topics (owner_email);
+CREATE INDEX IF NOT EXISTS idx_topics_deadline ON topics (deadline);
+
+CREATE TABLE IF NOT EXISTS votes (
+    row_id      INTEGER PRIMARY KEY,
+    topic_title TEXT NOT NULL,
+    option      TEXT NOT NULL,
+    voted_at    TEXT NOT NULL,
+    voted_email TEXT NOT NULL,
+    uuid        TEXT NOT NULL,
+    vote_id     TEXT UNIQUE
+);
+CREATE INDEX IF NOT EXISTS idx_votes_uuid_voted_email ON votes (uuid, voted_email);
+
+CREATE TABLE IF NOT EXISTS topics_archive (
+    row_id      INTEGER PRIMARY KEY,
+    title       TEXT NOT NULL,
+    author      TEXT NOT NULL DEFAULT '',
+    options     TEXT NOT NULL,
+    deadline    TEXT NOT NULL DEFAULT '',
+    created_at  TEXT NOT NULL,
+    status      TEXT NOT NULL DEFAULT 'active',
+    owner_email TEXT NOT NULL DEFAULT '',
+    uuid        TEXT NOT NULL UNIQUE
+);
+CREATE INDEX IF NOT EXISTS idx_topics_archive_owner_email ON topics_archive (owner_email);
+
+CREATE TABLE IF NOT EXISTS votes_archive (
+    row_id      INTEGER PRIMARY KEY,
+    topic_title TEXT NOT NULL,
+    option      TEXT NOT NULL,
+    voted_at    TEXT NOT NULL,
+    voted_email TEXT NOT NULL,
+    uuid        TEXT NOT NULL,
+    vote_id     TEXT UNIQUE
+);
+CREATE INDEX IF NOT EXISTS idx_votes_archive_uuid ON votes_archive (uuid);
+"""
+
+# アーカイブの対象になる議題
+ARCHIVE_WHERE = "status IN ('closed', 'deleted') AND deadline != '' AND deadline < ?"
+
+
+class SQLiteBackend(StorageBackend):
+    def __init__(self, path):
+        self.path = path
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        self._conn.executescript(SCHEMA)
+
+    def _query(self, sql, params=(), columns=None):
+        with self._lock:
+            rows = self._conn.execute(sql, params).fetchall()
+        values = list(zip(*rows)) if rows else [[] for _ in columns]
+        return frame_from_columns(dict(zip(columns, values)))
+
+    def read_topics(self, columns=None):
+        columns = [c for c in (columns or TOPIC_COLUMNS) if c in TOPIC_COLUMNS]
+        sql = f"SELECT {', '.join(columns)} FROM topics ORDER BY row_id"
+        return self._query(sql, columns=columns)
+
+    def read_votes(self):
+        sql = f"SELECT {', '.join(VOTE_COLUMNS)} FROM votes ORDER BY row_id"
+        return self._query(sql, columns=VOTE_COLUMNS)
+
+    def add_topic(self, row):
+        values = list(row) + [str(uuid_lib.uuid4())]
+        placeholders = ", ".join("?" for _ in TOPIC_COLUMNS)
+        with self._lock, self._conn:
+            self._conn.execute(
+                f"INSERT INTO topics ({', '.join(TOPIC_COLUMNS)}) VALUES ({placeholders})",
+                values,
+            )
+
+    def add_votes(self, rows):
+        placeholders = ", ".join("?" for _ in VOTE_COLUMNS)
+        with self._lock, self._conn:
+            # 同じ vote_id は 1 回だけ保存する
+            self._conn.executemany(
+                f"INSERT OR IGNORE INTO votes ({', '.join(VOTE_COLUMNS)}) VALUES ({placeholders})",
+                rows,
+            )
+
+    def update_statuses(self, updates, owner_email=None):
+        sql = "UPDATE topics SET status = ? WHERE uuid = ?"
+        if owner_email is not None:
+            sql += " AND owner_email = ?"
+        updated = []
+        # 1 つのトランザクションでまとめて書き込む
+        with self._lock, self._conn:
+            for uuid, status in updates:
+                params = [status, str(uuid)]
+                if owner_email is not None:
+                    params.append(owner_email)
+                if self._conn.execute(sql, params).rowcount > 0:
+                    updated.append(str(uuid))
+        return updated
+
+    def existing_vote_ids(self, vote_ids):
+        vote_ids = list(vote_ids)
+        if not vote_ids:
+            return set()
+        placeholders = ", ".join("?" for _ in vote_ids)
+        with self._lock:
+            rows = self._conn.execute(
+                f"SELECT vote_id FROM votes WHERE vote_id IN ({placeholders})", vote_ids
+            ).fetchall()
+        return {row[0] for row in rows}
+
+    def archive_topics(self, before):
+        cutoff = (before.strftime(DEADLINE_FORMAT),)
+        topic_columns = ", ".join(TOPIC_COLUMNS)
+        vote_columns = ", ".join(VOTE_COLUMNS)
+        targets = f"SELECT uuid FROM topics WHERE {ARCHIVE_WHERE}"
+        # コピーと削除を 1 つのトランザクションで行う
+        with self._lock, self._conn:
+            self._conn.execute(
+                f"INSERT OR IGNORE INTO topics_archive ({topic_columns}) "
+                f"SELECT {topic_columns} FROM topics WHERE {ARCHIVE_WHERE} ORDER BY row_id",
+                cutoff,
+            )
+            self._conn.execute(
+                f"INSERT OR IGNORE INTO votes_archive ({vote_columns}) "
+                f"SELECT {vote_columns} FROM votes WHERE uuid IN ({targets}) ORDER BY row_id",
+                cutoff,
+            )
+            self._conn.execute(f"DELETE FROM votes WHERE uuid IN ({targets})", cutoff)
+            return self._conn.execute(f"DELETE FROM topics WHERE {ARCHIVE_WHERE}", cutoff).rowcount
+
+    def archived_topics(self, owner_email):
+        sql = f"""
+            SELECT {', '.join(TOPIC_COLUMNS)} FROM topics_archive
+            WHERE owner_email = ? AND status = 'closed'
+            ORDER BY row_id
+        """
+        return self._query(sql, (owner_email,), columns=TOPIC_COLUMNS)
+
+    def archived_votes(self, uuid):
+        sql = f"SELECT {', '.join(VOTE_COLUMNS)} FROM votes_archive WHERE uuid = ? ORDER BY row_id"
+        return self._query(sql, (str(uuid),), columns=VOTE_COLUMNS)
+
+    def finished_topics(self, owner_email):
+        # 締切を過ぎた議題は、締切処理が closed にする前でも締切済みとして扱う
+        now = pd.Timestamp.now(tz=TIMEZONE).strftime(DEADLINE_FORMAT)
+        sql = f"""
+            SELECT {', '.join(TOPIC_COLUMNS)} FROM topics
+            WHERE owner_email = ?
+              AND (status = 'closed' OR (status = 'active' AND deadline != '' AND deadline < ?))
+            ORDER BY row_id
+        """
+        return self._query(sql, (owner_email, now), columns=TOPIC_COLUMNS)
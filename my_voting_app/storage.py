@@ -0,0 +1,154 @@
+from abc import ABC, abstractmethod
+
+import pandas as pd
+
+# ---------------------------------------------------------
+# 保存先（ストレージ）の共通インターフェース
+# ---------------------------------------------------------
+# db_handler はこのインターフェースだけを使って読み書きします。
+# Googleスプレッドシート版（db_handler.SheetsBackend）と
+# SQLite 版（sqlite_backend.SQLiteBackend）があり、設定で切り替えます。
+
+# topics の列（uuid は保存先で採番されます）
+TOPIC_COLUMNS = ["title", "author", "options", "deadline", "created_at", "status", "owner_email", "uuid"]
+# votes の列（vote_id で二重書き込みを防ぎます）
+VOTE_COLUMNS = ["topic_title", "option", "voted_at", "voted_email", "uuid", "vote_id"]
+
+# deadline の保存形式とタイムゾーン
+DEADLINE_FORMAT = "%Y-%m-%d %H:%M"
+TIMEZONE = "Asia/Tokyo"
+
+# 種類の少ない値を持つ列はカテゴリ型にしてメモリを節約します
+CATEGORY_COLUMNS = ["uuid", "option", "status", "voted_email"]
+
+
+class StorageBackend(ABC):
+    @abstractmethod
+    def read_topics(self, columns=None):
+        """topics を apply_schema() 済みの DataFrame で返す。
+
+        columns を指定するとその列だけを読み込みます。
+        返り値は他のセッションと共有されることがあるので、変更しないでください。
+        """
+
+    def cached_topics(self, columns=None):
+        """読み込み済みの topics を、保存先に問い合わせずに返す（無ければ None）。
+
+        投票のように保存先が使えなくても止めたくない処理で使います。
+        手元で読める保存先では read_topics() と同じです。
+        """
+        return self.read_topics(columns)
+
+    @abstractmethod
+    def read_votes(self):
+        """votes 全体を apply_schema() 済みの DataFrame で返す。"""
+
+    def sync_votes(self, max_age=None):
+        """保存先で増えた投票を取り込む（必要な保存先だけ実装します）。
+
+        max_age 秒以内に取り込み済みなら何もしません（None は保存先ごとの既定値）。
+        """
+
+    def reload_votes(self):
+        """votes を全件読み直して DataFrame で返す。"""
+        return self.read_votes()
+
+    def check_vote_header(self):
+        """votes に vote_id 列があることを確かめ、無ければ追加する（必要な保存先だけ実装します）。
+
+        直せない見出しの時は RuntimeError にします。
+        投票を書き込む前に db_handler.VoteFlusher が呼びます。
+        """
+
+    def add_vote_listener(self, listener):
+        """保存先から投票を読み込んだ時に知らせる相手を登録する。
+
+        listener.votes_appended(records) は新しく読んだ行（dict のリスト）で、
+        listener.votes_reset(votes_df) は全件を読み直した時に呼ばれます。
+        このプロセスの書き込みしか無い保存先では何もしません。
+        """
+
+    @abstractmethod
+    def add_topic(self, row):
+        """TOPIC_COLUMNS から uuid を除いた順の 1 行を追加する。"""
+
+    @abstractmethod
+    def add_votes(self, rows):
+        """VOTE_COLUMNS の順の行をまとめて追加する。"""
+
+    @abstractmethod
+    def update_statuses(self, updates, owner_email=None):
+        """(uuid, 新しいステータス) の組をまとめて 1 回で書き込む。
+
+        owner_email を指定した場合はその人が作成した議題だけを対象にします。
+        変更できた uuid のリストを返します。
+        """
+
+    def update_status(self, uuid, status, owner_email=None):
+        """議題 1 件のステータスを変更する。変更できたら True を返す。"""
+        return bool(self.update_statuses([(uuid, status)], owner_email))
+
+    @abstractmethod
+    def existing_vote_ids(self, vote_ids):
+        """vote_ids のうち、すでに保存されているものを set で返す。"""
+
+    @abstractmethod
+    def finished_topics(self, owner_email):
+        """owner_email が作成した、締切済み（status が closed）の議題を返す。
+
+        期限を過ぎた議題は db_handler.DeadlineScheduler が closed にしますが、
+        それより前でも締切を過ぎた active の議題は締切済みとして返します。
+        """
+
+    @abstractmethod
+    def archive_topics(self, before):
+        """締切が before より前の終了・削除済みの議題を、その投票と一緒にアーカイブへ移す。
+
+        before はタイムゾーン付きの日時です。移した議題の件数を返します。
+        """
+
+    @abstractmethod
+    def archived_topics(self, owner_email):
+        """owner_email が作成した、アーカイブ済みの締切済み（closed）の議題を返す。"""
+
+    @abstractmethod
+    def archived_votes(self, uuid):
+        """アーカイブ済みの議題 uuid の投票を返す。"""
+
+
+def parse_deadline(values):
+    """deadline の文字列をタイムゾーン付き（日本時間）の日時に変換する。"""
+    values = pd.Series(values, dtype=object).fillna("").astype(str)
+    parsed = pd.to_datetime(values, errors="coerce", format=DEADLINE_FORMAT)
+    # 形式が違うもの（シート側で書式が変わった等）だけ柔軟に読み直す
+    retry = parsed.isna() & (values != "")
+    if retry.any():
+        parsed[retry] = pd.to_datetime(values[retry], errors="coerce", format="mixed")
+    return parsed.dt.tz_localize(TIMEZONE)
+
+def apply_schema(df):
+    """読み込んだ文字列だけの DataFrame に決まった型を付ける。
+
+    uuid / option / status / voted_email はカテゴリ型、
+    deadline は日本時間のタイムゾーン付き日時になります。
+    """
+    for col in df.columns:
+        if col in CATEGORY_COLUMNS:
+            df[col] = df[col].astype("category")
+        elif col == "deadline":
+            df[col] = parse_deadline(df[col])
+    return df
+
+def frame_from_columns(columns):
+    """{列名: 値のリスト} から DataFrame を作る（列ごとの長さの違いは "" で埋める）。"""
+    length = max((len(values) for values in columns.values()), default=0)
+    return apply_schema(pd.DataFrame({
+        name: pd.Series(list(values) + [""] * (length - len(values)), dtype=object)
+        for name, values in columns.items()
+    }))
+
+def empty_topics(columns=None):
+    return frame_from_columns({name: [] for name in (columns or TOPIC_COLUMNS)})
+
+def empty_votes():
+    return frame_from_columns({name: [] for name in VOTE_COLUMNS})
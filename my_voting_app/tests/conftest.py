@@ -0,0 +1,16 @@
+import os
+import sys
+import time
+
+# my_voting_app 直下のモジュール（db_handler など）を読み込めるようにパスを通す
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+
+
+def wait_until(condition, timeout=5):
+    """condition() が真になるまで待つ（バックグラウンドのスレッドを待つテスト用）。"""
+    deadline = time.monotonic() + timeout
+    while not condition():
+        if time.monotonic() > deadline:
+            return False
+        time.sleep(0.02)
+    return True
@@ -0,0 +1,168 @@
+import re
+
+import gspread
+
+from db_handler import RateLimiter, SheetConnection
+
+# ---------------------------------------------------------
+# テスト用の偽スプレッドシート
+# ---------------------------------------------------------
+# db_handler が使う gspread の呼び出しだけを、メモリ上の行のリストで真似します。
+# 本物と同じく、行末の空セルや末尾の空行は返しません。
+# SheetConnection に渡すと、レート制限・再試行を含めて本物と同じ経路で呼ばれます。
+
+_A1 = re.compile(r"^([A-Z]+)(\d*)(?::([A-Z]+)(\d*))?$")
+
+
+class FakeResponse:
+    def __init__(self, code, message):
+        self.text = message
+        self._error = {"code": code, "message": message, "status": ""}
+
+    def json(self):
+        return {"error": self._error}
+
+
+def api_error(code, message="error"):
+    return gspread.exceptions.APIError(FakeResponse(code, message))
+
+
+def _column_number(letters):
+    return gspread.utils.a1_to_rowcol(letters + "1")[1]
+
+def _trim(values):
+    values = list(values)
+    while values and values[-1] == "":
+        values.pop()
+    return values
+
+
+class FakeWorksheet:
+    def __init__(self, spreadsheet, title, rows, sheet_id):
+        self.spreadsheet = spreadsheet
+        self.title = title
+        self.id = sheet_id
+        self.rows = [list(row) for row in rows]
+        self.col_count = max((len(row) for row in self.rows), default=1)
+        self.calls = []  # 呼ばれたメソッド名
+        self.ranges = []  # get() に渡された範囲
+
+    def _range(self, a1):
+        """a1 の範囲を (開始行, 終了行, 開始列, 終了列) に直す（1 始まり、両端を含む）。"""
+        m = _A1.match(a1)
+        first_col, first_row, last_col, last_row = m.groups()
+        row1 = int(first_row) if first_row else 1
+        if last_col is None:
+            last_col, last_row = first_col, first_row
+        row2 = int(last_row) if last_row else max(len(self.rows), row1)
+        return row1, row2, _column_number(first_col), _column_number(last_col)
+
+    def _values(self, a1):
+        row1, row2, col1, col2 = self._range(a1)
+        rows = []
+        for row in self.rows[row1 - 1:row2]:
+            rows.append(_trim(row[col1 - 1:col2]))
+        while rows and not rows[-1]:
+            rows.pop()
+        return rows, col2 - col1 + 1
+
+    def get_all_values(self):
+        self.calls.append("get_all_values")
+        width = max((len(row) for row in self.rows), default=0)
+        return [row + [""] * (width - len(row)) for row in self.rows]
+
+    def row_values(self, row):
+        self.calls.append("row_values")
+        return _trim(self.rows[row - 1]) if row <= len(self.rows) else []
+
+    def get(self, a1):
+        self.calls.append("get")
+        self.ranges.append(a1)
+        if self._range(a1)[0] > len(self.rows):
+            raise api_error(400, f"Range ('{self.title}'!{a1}) exceeds grid limits. Max rows: {len(self.rows)}")
+        return self._values(a1)[0]
+
+    def batch_get(self, ranges, major_dimension="ROWS"):
+        self.calls.append("batch_get")
+        results = []
+        for a1 in ranges:
+            rows, width = self._values(a1)
+            if major_dimension == "COLUMNS":
+                padded = [row + [""] * (width - len(row)) for row in rows]
+                rows = [_trim(column) for column in zip(*padded)]
+                while rows and not rows[-1]:
+                    rows.pop()
+            results.append(rows)
+        return results
+
+    def _set(self, row, col, value):
+        while len(self.rows) < row:
+            self.rows.append([])
+        cells = self.rows[row - 1]
+        cells.extend([""] * (col - len(cells)))
+        cells[col - 1] = value
+
+    def append_row(self, row):
+        self.calls.append("append_row")
+        self.rows.append([str(value) for value in row])
+        return {}
+
+    def append_rows(self, rows):
+        self.calls.append("append_rows")
+        self.rows.extend([str(value) for value in row] for row in rows)
+        return {}
+
+    def update_acell(self, a1, value):
+        self.calls.append("update_acell")
+        row, col = gspread.utils.a1_to_rowcol(a1)
+        self._set(row, col, value)
+        return {}
+
+    def update(self, values, a1):
+        self.calls.append("update")
+        row, col = gspread.utils.a1_to_rowcol(a1)
+        for i, cells in enumerate(values):
+            for j, value in enumerate(cells):
+                self._set(row + i, col + j, value)
+        return {}
+
+    def batch_update(self, data):
+        self.calls.append("batch_update")
+        for entry in data:
+            self.update(entry["values"], entry["range"])
+        return {}
+
+    def add_cols(self, count):
+        self.calls.append("add_cols")
+        self.col_count += count
+
+
+class FakeSpreadsheet:
+    def __init__(self, sheets):
+        self.sheets = {}
+        for title, rows in sheets.items():
+            self.sheets[title] = FakeWorksheet(self, title, rows, len(self.sheets))
+
+    def worksheet(self, title):
+        if title not in self.sheets:
+            raise gspread.exceptions.WorksheetNotFound(title)
+        return self.sheets[title]
+
+    def add_worksheet(self, title, rows, cols):
+        self.sheets[title] = FakeWorksheet(self, title, [], len(self.sheets))
+        return self.sheets[title]
+
+    def batch_update(self, body):
+        by_id = {ws.id: ws for ws in self.sheets.values()}
+        for request in body["requests"]:
+            target = request["deleteDimension"]["range"]
+            ws = by_id[target["sheetId"]]
+            del ws.rows[target["startIndex"]:target["endIndex"]]
+        return {}
+
+
+def fake_connection(sheets):
+    """sheets（シート名 -> 行のリスト）を持つ偽スプレッドシートにつないだ SheetConnection を返す。"""
+    connection = SheetConnection(RateLimiter(6000, 6000))
+    connection._sheet = FakeSpreadsheet(sheets)
+    return connection
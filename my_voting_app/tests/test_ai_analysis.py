@@ -0,0 +1,134 @@
+import threading
+import time
+
+import pandas as pd
+import pytest
+
+from ai_analysis import AnalysisCache, AnalysisService, GeminiModel, StubModel, group_answers
+
+
+def result_df():
+    return pd.DataFrame({"選択肢": ["A", "B"], "投票数": [3, 1]})
+
+
+class SlowModel:
+    """いつまでも少しずつ出力し続けるモデル。止められたかどうかを記録する。"""
+
+    model = "slow"
+
+    def __init__(self, delay=0.02):
+        self.delay = delay
+        self.closed = threading.Event()
+
+    def generate(self, prompt):
+        return "".join(self.generate_stream(prompt))
+
+    def generate_stream(self, prompt):
+        try:
+            while True:
+                time.sleep(self.delay)
+                yield "x"
+        finally:
+            self.closed.set()
+
+
+def test_gemini_client_is_created_lazily():
+    # 結果ページを開いただけでは SDK を読み込まない
+    assert GeminiModel("dummy-key", "gemini-2.5-flash")._client is None
+
+def test_stub_model_streams_its_text_in_chunks():
+    model = StubModel(text="0123456789", chunk_size=4, delay=0)
+    assert model.generate("prompt") == "0123456789"
+    assert list(model.generate_stream("prompt")) == ["0123", "4567", "89"]
+
+def test_analyze_with_stub_model():
+    service = AnalysisService(StubModel(text="分析結果", delay=0))
+    assert service.analyze("議題", result_df()) == "分析結果"
+
+def test_analyze_stream_yields_chunks_and_caches_the_result(tmp_path):
+    cache = AnalysisCache(str(tmp_path), max_entries=10, max_age_days=1)
+    model = StubModel(text="0123456789", chunk_size=4, delay=0)
+    service = AnalysisService(model, cache)
+
+    assert list(service.analyze_stream("議題", result_df(), uuid="u1")) == ["0123", "4567", "89"]
+    # 2 回目は保存済みの結果をまとめて返す
+    model.text = "changed"
+    assert list(service.analyze_stream("議題", result_df(), uuid="u1")) == ["0123456789"]
+
+def test_analyze_stream_times_out_and_stops_the_model(tmp_path):
+    cache = AnalysisCache(str(tmp_path), max_entries=10, max_age_days=1)
+    model = SlowModel()
+    service = AnalysisService(model, cache)
+
+    with pytest.raises(TimeoutError):
+        list(service.analyze_stream("議題", result_df(), uuid="u1", timeout=0.2))
+    assert model.closed.wait(1)
+    # 途中で終わった分析は保存しない
+    assert list(tmp_path.iterdir()) == []
+
+def test_closing_the_stream_stops_the_model():
+    model = SlowModel()
+    stream = AnalysisService(model).analyze_stream("議題", result_df())
+    assert next(stream) == "x"
+    stream.close()
+    assert model.closed.wait(1)
+
+
+def free_answers(count):
+    return pd.DataFrame({"選択肢": [f"自由回答その{i}" for i in range(count)], "投票数": [1] * count})
+
+
+class RecordingModel:
+    """受け取ったプロンプトを記録し、map には部分ごとの要約を返すモデル。"""
+
+    model = "recording"
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.prompts = []
+
+    def generate(self, prompt):
+        with self._lock:
+            self.prompts.append(prompt)
+        return "要約" if "自由回答の一部" in prompt else "最終分析"
+
+
+def test_group_answers_merges_spelling_variants():
+    df = pd.DataFrame({"選択肢": ["ＡＢＣ", "abc ", "a  b", "A B", ""], "投票数": [2, 1, 1, 1, 5]})
+    grouped = group_answers(df)
+    assert list(grouped["選択肢"]) == ["ＡＢＣ", "a b"]
+    assert list(grouped["投票数"]) == [3, 2]
+
+def test_small_free_input_is_analyzed_in_one_call():
+    model = RecordingModel()
+    service = AnalysisService(model, batch_tokens=10_000)
+    assert service.analyze("議題", free_answers(5), free_input=True) == "最終分析"
+    assert len(model.prompts) == 1
+
+def test_large_free_input_is_mapped_then_reduced():
+    model = RecordingModel()
+    service = AnalysisService(model, batch_tokens=50, map_workers=2)
+    progress = []
+
+    text = "".join(service.analyze_stream(
+        "議題", free_answers(20), free_input=True, on_progress=lambda done, total: progress.append((done, total)),
+    ))
+
+    maps = [p for p in model.prompts if "自由回答の一部" in p]
+    assert text == "最終分析"
+    assert len(maps) > 1
+    assert len(model.prompts) == len(maps) + 1
+    assert "部分ごとの要約" in model.prompts[-1]
+    # 要約を始める前と終わった時に進み具合を知らせる
+    assert progress[0] == (0, len(maps))
+    assert progress[-1] == (len(maps), len(maps))
+
+def test_map_timeout_stops_running_workers():
+    model = SlowModel()
+    service = AnalysisService(model, batch_tokens=50, map_workers=2)
+
+    with pytest.raises(TimeoutError):
+        list(service.analyze_stream("議題", free_answers(20), free_input=True, timeout=0.2))
+    assert model.closed.wait(1)
+    # 実行中だった要約も止まり、ワーカーが空いている
+    assert service._executor.submit(lambda: "free").result(timeout=1) == "free"
@@ -0,0 +1,72 @@
+from db_handler import ChangeProbe, TableCache
+
+
+class FakeProbe(ChangeProbe):
+    """version() で返す印をテストから差し替えられる偽物。"""
+
+    def __init__(self, value="v1"):
+        super().__init__()
+        self.value = value
+        self.reads = 0
+
+    def _read_version(self):
+        self.reads += 1
+        if isinstance(self.value, Exception):
+            raise self.value
+        return self.value
+
+
+class CountingLoader:
+    def __init__(self):
+        self.calls = 0
+
+    def __call__(self):
+        self.calls += 1
+        return f"data{self.calls}"
+
+
+def test_unchanged_version_skips_reload():
+    probe, loader = FakeProbe(), CountingLoader()
+    cache = TableCache(ttl=60, probe=probe)
+    assert cache.get("topics", loader) == "data1"
+
+    cache.expire("topics")
+    assert cache.get("topics", loader) == "data1"
+    assert loader.calls == 1
+
+def test_changed_version_reloads():
+    probe, loader = FakeProbe(), CountingLoader()
+    cache = TableCache(ttl=60, probe=probe)
+    cache.get("topics", loader)
+
+    probe.value = "v2"
+    cache.expire("topics")
+    assert cache.get("topics", loader) == "data2"
+
+def test_unknown_version_reloads():
+    probe, loader = FakeProbe(), CountingLoader()
+    cache = TableCache(ttl=60, probe=probe)
+    cache.get("topics", loader)
+
+    # 調べられない時は「変わったかもしれない」として読み直す
+    probe.value = RuntimeError("drive error")
+    cache.expire("topics")
+    assert cache.get("topics", loader) == "data2"
+
+def test_invalidate_ignores_matching_version():
+    probe, loader = FakeProbe(), CountingLoader()
+    cache = TableCache(ttl=60, probe=probe)
+    cache.get("topics", loader)
+    cache.get("votes", loader)
+
+    cache.invalidate("topics")
+    assert cache.get("topics", loader) == "data3"
+    assert cache.get("votes", loader) == "data2"
+
+def test_probe_reuses_result_within_interval():
+    probe = FakeProbe()
+    probe.interval = 60
+    assert probe.version() == "v1"
+    probe.value = "v2"
+    assert probe.version() == "v1"
+    assert probe.reads == 1
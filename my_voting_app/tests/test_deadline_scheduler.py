@@ -0,0 +1,75 @@
+import threading
+import time
+
+import pandas as pd
+
+from conftest import wait_until
+from db_handler import DeadlineScheduler
+from storage import TIMEZONE
+
+
+class FakeBackend:
+    def __init__(self, topics):
+        self._lock = threading.Lock()
+        self.topics = topics  # uuid -> [deadline, status]
+        self.updates = []
+
+    def read_topics(self, columns=None):
+        with self._lock:
+            rows = [(uuid, deadline, status) for uuid, (deadline, status) in self.topics.items()]
+        return pd.DataFrame(rows, columns=["uuid", "deadline", "status"])
+
+    def update_statuses(self, updates, owner_email=None):
+        with self._lock:
+            self.updates.append(list(updates))
+            for uuid, status in updates:
+                self.topics[uuid][1] = status
+        return [uuid for uuid, _ in updates]
+
+    def status(self, uuid):
+        with self._lock:
+            return self.topics[uuid][1]
+
+
+def at(seconds):
+    return pd.Timestamp.now(tz=TIMEZONE) + pd.Timedelta(seconds=seconds)
+
+
+def test_expired_topics_are_closed_in_one_write():
+    backend = FakeBackend({
+        "expired1": [at(-60), "active"],
+        "expired2": [at(-30), "active"],
+        "deleted": [at(-60), "deleted"],
+        "future": [at(3600), "active"],
+        "no-deadline": [pd.NaT, "active"],
+    })
+    scheduler = DeadlineScheduler(backend, rescan_interval=60)
+    try:
+        assert wait_until(lambda: backend.updates)
+        assert sorted(backend.updates[0]) == [("expired1", "closed"), ("expired2", "closed")]
+        assert backend.status("deleted") == "deleted"
+        assert backend.status("future") == "active"
+        assert backend.status("no-deadline") == "active"
+    finally:
+        scheduler.close()
+
+def test_topic_is_closed_when_its_deadline_arrives():
+    backend = FakeBackend({"soon": [at(0.5), "active"]})
+    scheduler = DeadlineScheduler(backend, rescan_interval=60)
+    try:
+        time.sleep(0.2)
+        assert backend.status("soon") == "active"
+        assert wait_until(lambda: backend.status("soon") == "closed")
+    finally:
+        scheduler.close()
+
+def test_topic_closed_by_hand_is_not_written_again():
+    backend = FakeBackend({"soon": [at(0.3), "active"]})
+    scheduler = DeadlineScheduler(backend, rescan_interval=60)
+    try:
+        time.sleep(0.1)
+        backend.topics["soon"][1] = "deleted"
+        time.sleep(0.6)
+        assert backend.updates == []
+    finally:
+        scheduler.close()
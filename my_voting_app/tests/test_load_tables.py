@@ -0,0 +1,79 @@
+import pytest
+import streamlit as st
+
+import db_handler
+from conftest import wait_until
+from storage import VOTE_COLUMNS
+
+
+@pytest.fixture
+def app(tmp_path, monkeypatch):
+    """SQLite 版の保存先と一時ファイルのジャーナルで db_handler を動かす。"""
+    monkeypatch.setattr(db_handler, "STORAGE_BACKEND", "sqlite")
+    monkeypatch.setattr(db_handler, "SQLITE_PATH", str(tmp_path / "voting_app.db"))
+    monkeypatch.setattr(db_handler, "VOTE_JOURNAL_PATH", str(tmp_path / "vote_journal.jsonl"))
+    st.cache_resource.clear()
+    yield db_handler
+    db_handler.get_vote_flusher().close()
+    db_handler.get_deadline_scheduler().close()
+    db_handler.get_vote_writer().close()
+    st.cache_resource.clear()
+
+def add_topic(app, title, status="active", owner="owner@example.com"):
+    backend = app.get_backend()
+    backend.add_topic([title, "作成者", "A,B", "2030-01-01 12:00", "2024-01-01 09:00", status, owner])
+    topics = backend.read_topics(["title", "uuid"])
+    return str(topics.loc[topics["title"] == title, "uuid"].iloc[0])
+
+
+def test_tables_are_loaded_together(app):
+    uuid = add_topic(app, "受付中")
+    add_topic(app, "終了", status="closed")
+    app.get_backend().add_votes([["受付中", "A", "2024-01-01 10:00", "a@example.com", uuid, "v1"]])
+
+    loaded, errors = app.load_tables(
+        ["topics", "tallies", "finished_topics", "votes"],
+        topic_columns=["title", "uuid"],
+        owner_email="owner@example.com",
+    )
+
+    assert errors == {}
+    assert list(loaded["topics"].columns) == ["title", "uuid"]
+    assert loaded["tallies"].tally(uuid) == {"A": 1}
+    assert list(loaded["finished_topics"]["title"]) == ["終了"]
+    assert list(loaded["votes"]["vote_id"]) == ["v1"]
+
+def test_votes_include_the_journal_once(app):
+    uuid = add_topic(app, "受付中")
+    row = ["受付中", "B", "2024-01-01 10:00", "b@example.com", uuid, "v2"]
+    app.get_vote_journal().append("v2", row)
+
+    # ジャーナルにだけある時も、保存先に届いた後も 1 回だけ含まれる
+    loaded, errors = app.load_tables(["votes"])
+    assert list(loaded["votes"]["vote_id"]) == ["v2"]
+    app.get_backend().add_votes([row])
+    loaded, errors = app.load_tables(["votes"])
+    assert list(loaded["votes"]["vote_id"]) == ["v2"]
+    assert list(loaded["votes"].columns) == VOTE_COLUMNS
+
+def test_a_failing_table_falls_back_to_empty(app, monkeypatch):
+    add_topic(app, "受付中")
+
+    def fail(owner_email):
+        raise RuntimeError("読み込みに失敗")
+    monkeypatch.setattr(app.get_backend(), "finished_topics", fail)
+
+    loaded, errors = app.load_tables(["topics", "finished_topics"], owner_email="owner@example.com")
+    assert list(errors) == ["finished_topics"]
+    assert loaded["finished_topics"].empty
+    assert len(loaded["topics"]) == 1
+
+def test_unfixable_votes_header_fails_every_table(app):
+    flusher = app.get_vote_flusher()
+    assert wait_until(lambda: flusher._header_checked)
+    error = RuntimeError("votes シートの見出しが想定と違います")
+    flusher.header_error = error
+
+    loaded, errors = app.load_tables(["topics", "tallies"])
+    assert errors == {"topics": error, "tallies": error}
+    assert loaded["topics"].empty
@@ -0,0 +1,114 @@
+import threading
+import time
+
+from db_handler import (
+    PRIORITY_BACKGROUND,
+    PRIORITY_INTERACTIVE,
+    PRIORITY_VOTE,
+    PriorityLock,
+    RateLimiter,
+    SingleFlight,
+    set_api_priority,
+)
+
+
+def test_calls_within_quota_are_not_throttled():
+    limiter = RateLimiter(read_per_minute=60, write_per_minute=60)
+    for _ in range(5):
+        limiter.acquire("read", PRIORITY_BACKGROUND)
+    assert limiter.stats["calls"] == 5
+    assert limiter.stats["throttled"] == 0
+
+def test_empty_bucket_waits_for_refill():
+    # 1 秒に 10 トークン
+    limiter = RateLimiter(read_per_minute=600, write_per_minute=600)
+    limiter._tokens["write"] = 0
+
+    started = time.monotonic()
+    limiter.acquire("write", PRIORITY_VOTE)
+    assert time.monotonic() - started >= 0.05
+    assert limiter.stats["throttled"] == 1
+    # 読み込みのバケットは別
+    limiter.acquire("read", PRIORITY_VOTE)
+    assert limiter.stats["throttled"] == 1
+
+def test_higher_priority_goes_first():
+    limiter = RateLimiter(read_per_minute=600, write_per_minute=600)
+    limiter._tokens["read"] = 0
+    order = []
+
+    def call(name, priority):
+        limiter.acquire("read", priority)
+        order.append(name)
+
+    background = threading.Thread(target=call, args=("background", PRIORITY_BACKGROUND))
+    vote = threading.Thread(target=call, args=("vote", PRIORITY_VOTE))
+    background.start()
+    time.sleep(0.02)
+    vote.start()
+    background.join(2)
+    vote.join(2)
+
+    assert order == ["vote", "background"]
+
+def run_in_thread(priority, func):
+    def target():
+        set_api_priority(priority)
+        func()
+    thread = threading.Thread(target=target)
+    thread.start()
+    return thread
+
+def test_lock_holder_inherits_the_waiters_priority():
+    limiter = RateLimiter(read_per_minute=600, write_per_minute=600)
+    limiter._tokens["read"] = 0
+    lock = PriorityLock()
+    order = []
+
+    def other_background():
+        limiter.acquire("read")
+        order.append("other")
+
+    def holder():
+        with lock:
+            limiter.acquire("read")
+            order.append("holder")
+
+    def interactive():
+        with lock:
+            order.append("interactive")
+
+    threads = [run_in_thread(PRIORITY_BACKGROUND, other_background)]
+    time.sleep(0.01)
+    threads.append(run_in_thread(PRIORITY_BACKGROUND, holder))
+    time.sleep(0.01)
+    threads.append(run_in_thread(PRIORITY_INTERACTIVE, interactive))
+    for thread in threads:
+        thread.join(2)
+
+    # 先に並んでいた other より、画面表示に待たれている holder を先に通す
+    assert order[:2] == ["holder", "interactive"]
+
+def test_single_flight_leader_inherits_the_followers_priority():
+    limiter = RateLimiter(read_per_minute=600, write_per_minute=600)
+    limiter._tokens["read"] = 0
+    flight = SingleFlight()
+    order = []
+
+    def other_background():
+        limiter.acquire("read")
+        order.append("other")
+
+    def load():
+        limiter.acquire("read")
+        order.append("leader")
+
+    threads = [run_in_thread(PRIORITY_BACKGROUND, other_background)]
+    time.sleep(0.01)
+    threads.append(run_in_thread(PRIORITY_BACKGROUND, lambda: flight.do("votes", load)))
+    time.sleep(0.01)
+    threads.append(run_in_thread(PRIORITY_INTERACTIVE, lambda: flight.do("votes", load)))
+    for thread in threads:
+        thread.join(2)
+
+    assert order == ["leader", "other"]
@@ -0,0 +1,60 @@
+import pytest
+import requests
+
+import db_handler
+from fakes import api_error, fake_connection
+
+
+class Flaky:
+    """最初の数回だけ errors の例外を起こし、その後は "ok" を返す。"""
+
+    def __init__(self, *errors):
+        self.errors = list(errors)
+        self.calls = 0
+
+    def __call__(self, ws):
+        self.calls += 1
+        if self.errors:
+            raise self.errors.pop(0)
+        return "ok"
+
+
+@pytest.fixture(autouse=True)
+def short_backoff(monkeypatch):
+    monkeypatch.setattr(db_handler, "SHEETS_BACKOFF_BASE_SECONDS", 0.001)
+
+@pytest.fixture
+def connection():
+    return fake_connection({"votes": [["vote_id"]]})
+
+
+def test_reads_are_retried_on_5xx(connection):
+    func = Flaky(api_error(503), api_error(500))
+    assert connection.call("votes", func) == "ok"
+    assert func.calls == 3
+    assert connection.limiter.stats["retried"] == 2
+
+def test_appends_are_not_retried_on_5xx(connection):
+    # 5xx でも追記が反映済みのことがあるので、やり直すと二重になる
+    func = Flaky(api_error(503))
+    with pytest.raises(db_handler.gspread.exceptions.APIError):
+        connection.call("votes", func, "write", idempotent=False)
+    assert func.calls == 1
+    assert connection.limiter.stats["failed"] == 1
+
+def test_appends_are_retried_on_429(connection):
+    func = Flaky(api_error(429))
+    assert connection.call("votes", func, "write", idempotent=False) == "ok"
+    assert func.calls == 2
+
+def test_appends_are_not_retried_after_a_read_timeout(connection):
+    func = Flaky(requests.exceptions.ReadTimeout())
+    with pytest.raises(requests.exceptions.ReadTimeout):
+        connection.call("votes", func, "write", idempotent=False)
+    assert func.calls == 1
+
+def test_client_errors_are_not_retried(connection):
+    func = Flaky(api_error(400))
+    with pytest.raises(db_handler.gspread.exceptions.APIError):
+        connection.call("votes", func)
+    assert func.calls == 1
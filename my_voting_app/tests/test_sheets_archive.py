@@ -0,0 +1,72 @@
+import pandas as pd
+
+from db_handler import SheetsBackend, TableCache, VoteSync
+from fakes import fake_connection
+from storage import TIMEZONE, TOPIC_COLUMNS, VOTE_COLUMNS
+
+
+def topic(uuid, status, deadline="2020-01-01 12:00"):
+    return [uuid, "作成者", "A,B", deadline, "2019-12-01 09:00", status, "owner@example.com", uuid]
+
+def vote(uuid, email, vote_id=""):
+    # vote_id が空の行は、vote_id 列が無かった頃の投票
+    return [uuid, "A", "2019-12-02 10:00", email, uuid, vote_id]
+
+def make_backend(topics, votes):
+    connection = fake_connection({
+        "topics": [TOPIC_COLUMNS] + topics,
+        "votes": [VOTE_COLUMNS] + votes,
+    })
+    backend = SheetsBackend(connection, TableCache(0), VoteSync(connection, 3600))
+    return backend, connection._sheet
+
+CUTOFF = pd.Timestamp("2024-01-01", tz=TIMEZONE)
+
+
+def test_archive_moves_topics_and_votes():
+    backend, sheet = make_backend(
+        [topic("t1", "closed"), topic("t2", "active"), topic("t3", "deleted", "2030-01-01 12:00")],
+        [vote("t1", "a@example.com", "v1"), vote("t2", "b@example.com", "v2"), vote("t1", "c@example.com")],
+    )
+
+    assert backend.archive_topics(CUTOFF) == 1
+
+    assert [row[-1] for row in sheet.sheets["topics"].rows[1:]] == ["t2", "t3"]
+    assert [row[4] for row in sheet.sheets["votes"].rows[1:]] == ["t2"]
+    assert [row[-1] for row in sheet.sheets["topics_archive"].rows[1:]] == ["t1"]
+    assert sorted(row[3] for row in sheet.sheets["votes_archive"].rows[1:]) == ["a@example.com", "c@example.com"]
+    assert list(backend.archived_votes("t1")["voted_email"]) == ["a@example.com", "c@example.com"]
+
+def test_legacy_votes_without_vote_id_are_never_lost():
+    backend, sheet = make_backend(
+        [topic("t1", "closed"), topic("t3", "active")],
+        [
+            vote("t1", "a@example.com"),
+            vote("t1", "b@example.com", "v1"),
+            vote("t3", "c@example.com"),
+            vote("t3", "d@example.com"),
+        ],
+    )
+    backend.archive_topics(CUTOFF)
+
+    # 2 回目：アーカイブにはすでに空の vote_id と空でない vote_id がある
+    backend.update_statuses([("t3", "closed")])
+    assert backend.archive_topics(CUTOFF) == 1
+
+    archived = [row[3] for row in sheet.sheets["votes_archive"].rows[1:] if row[4] == "t3"]
+    assert sorted(archived) == ["c@example.com", "d@example.com"]
+    assert sheet.sheets["votes"].rows[1:] == []
+
+def test_rerun_after_partial_move_does_not_duplicate():
+    backend, sheet = make_backend(
+        [topic("t1", "closed")],
+        [vote("t1", "a@example.com", "v1")],
+    )
+    # 前回はアーカイブへ書いたところで止まっていた
+    sheet.add_worksheet("topics_archive", 1, len(TOPIC_COLUMNS)).rows = [TOPIC_COLUMNS, topic("t1", "closed")]
+    sheet.add_worksheet("votes_archive", 1, len(VOTE_COLUMNS)).rows = [VOTE_COLUMNS, vote("t1", "a@example.com", "v1")]
+
+    assert backend.archive_topics(CUTOFF) == 1
+    assert len(sheet.sheets["topics_archive"].rows) == 2
+    assert len(sheet.sheets["votes_archive"].rows) == 2
+    assert sheet.sheets["topics"].rows == [TOPIC_COLUMNS]
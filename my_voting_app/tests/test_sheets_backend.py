@@ -0,0 +1,67 @@
+import pytest
+
+from db_handler import SheetsBackend, TableCache, VoteSync
+from fakes import fake_connection
+from storage import TOPIC_COLUMNS, VOTE_COLUMNS
+
+
+def topic(uuid, status="active", deadline="2030-01-01 12:00"):
+    return [uuid, "作成者", "A,B", deadline, "2024-01-01 09:00", status, "owner@example.com", uuid]
+
+def make_backend(topics=(), votes=(), ttl=60, vote_header=VOTE_COLUMNS):
+    connection = fake_connection({
+        "topics": [TOPIC_COLUMNS] + list(topics),
+        "votes": [list(vote_header)] + list(votes),
+    })
+    backend = SheetsBackend(connection, TableCache(ttl), VoteSync(connection, 3600))
+    return backend, connection._sheet
+
+
+def test_cached_topics_never_reads_the_sheet():
+    backend, sheet = make_backend([topic("t1")])
+    # まだ読み込んでいない時は None（投票は止めない）
+    assert backend.cached_topics(["uuid", "status"]) is None
+    assert sheet.sheets["topics"].calls == []
+
+    backend.read_topics()
+    calls = list(sheet.sheets["topics"].calls)
+    cached = backend.cached_topics(["uuid", "status"])
+    assert list(cached.columns) == ["uuid", "status"]
+    assert list(cached["uuid"]) == ["t1"]
+    assert sheet.sheets["topics"].calls == calls
+
+def test_check_vote_header_adds_vote_id_to_the_old_header():
+    backend, sheet = make_backend(vote_header=VOTE_COLUMNS[:-1])
+    sheet.sheets["votes"].col_count = 5
+    backend.check_vote_header()
+    assert sheet.sheets["votes"].rows[0] == VOTE_COLUMNS
+    assert sheet.sheets["votes"].col_count == 6
+
+def test_check_vote_header_refuses_an_unknown_header():
+    backend, sheet = make_backend(vote_header=["title", "option"])
+    with pytest.raises(RuntimeError):
+        backend.check_vote_header()
+    assert sheet.sheets["votes"].rows[0] == ["title", "option"]
+
+def test_finished_topics_includes_expired_active_topics():
+    backend, _ = make_backend([
+        topic("open"),
+        topic("expired", deadline="2020-01-01 12:00"),
+        topic("closed", status="closed"),
+        topic("deleted", status="deleted", deadline="2020-01-01 12:00"),
+    ])
+    assert list(backend.finished_topics("owner@example.com")["uuid"]) == ["expired", "closed"]
+
+def test_all_projections_share_one_read():
+    backend, sheet = make_backend([topic("t1"), topic("t2", status="closed")])
+    backend.read_topics(["title", "status", "owner_email", "uuid"])
+    backend.read_topics(["uuid", "deadline", "status"])
+    assert list(backend.read_topics(["uuid", "owner_email"]).columns) == ["uuid", "owner_email"]
+    assert list(backend.finished_topics("owner@example.com")["uuid"]) == ["t2"]
+    assert sheet.sheets["topics"].calls.count("batch_get") == 1
+
+    # 書き込んだ後も 1 回の読み込みで済む
+    backend.add_topic(topic("t3")[:-1])
+    backend.read_topics(["uuid"])
+    backend.read_topics(["title"])
+    assert sheet.sheets["topics"].calls.count("batch_get") == 2
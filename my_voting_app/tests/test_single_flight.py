@@ -0,0 +1,47 @@
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import pytest
+
+from db_handler import SingleFlight
+
+
+def test_concurrent_calls_share_one_load():
+    flight = SingleFlight()
+    started, release = threading.Event(), threading.Event()
+    calls = []
+
+    def load():
+        calls.append(1)
+        started.set()
+        release.wait(1)
+        return "data"
+
+    with ThreadPoolExecutor(max_workers=4) as executor:
+        leader = executor.submit(flight.do, "votes", load)
+        started.wait(1)
+        followers = [executor.submit(flight.do, "votes", load) for _ in range(3)]
+        # 後から来た呼び出しが相乗りするまで待ってから読み込みを終える
+        time.sleep(0.2)
+        release.set()
+        results = [leader.result(1)] + [f.result(1) for f in followers]
+
+    assert results == ["data"] * 4
+    assert len(calls) == 1
+
+def test_error_is_shared_and_next_call_loads_again():
+    flight = SingleFlight()
+
+    def fail():
+        raise RuntimeError("quota")
+
+    with pytest.raises(RuntimeError):
+        flight.do("votes", fail)
+    # 終わった読み込みは残らない
+    assert flight.do("votes", lambda: "data") == "data"
+
+def test_different_keys_do_not_share():
+    flight = SingleFlight()
+    assert flight.do("topics", lambda: "topics") == "topics"
+    assert flight.do("votes", lambda: "votes") == "votes"
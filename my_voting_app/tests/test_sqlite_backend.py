@@ -0,0 +1,82 @@
+import pandas as pd
+import pytest
+
+from sqlite_backend import SQLiteBackend
+from storage import StorageBackend, TIMEZONE
+
+
+def topic_row(title, deadline, status="active", owner="owner@example.com"):
+    # TOPIC_COLUMNS から uuid を除いた順
+    return [title, "作成者", "A,B", deadline, "2024-01-01 09:00", status, owner]
+
+def vote_row(uuid, option, email, vote_id):
+    # VOTE_COLUMNS の順
+    return ["議題", option, "2024-01-01 10:00", email, uuid, vote_id]
+
+
+@pytest.fixture
+def backend(tmp_path):
+    return SQLiteBackend(str(tmp_path / "voting_app.db"))
+
+def uuid_of(backend, title):
+    topics = backend.read_topics(["title", "uuid"])
+    return str(topics.loc[topics["title"] == title, "uuid"].iloc[0])
+
+
+def test_storage_backend_is_abstract():
+    with pytest.raises(TypeError):
+        StorageBackend()
+
+def test_add_and_read_topics(backend):
+    backend.add_topic(topic_row("議題1", "2030-01-01 12:00"))
+    topics = backend.read_topics()
+    assert list(topics["title"]) == ["議題1"]
+    assert topics["uuid"].iloc[0] != ""
+    assert topics["deadline"].iloc[0] == pd.Timestamp("2030-01-01 12:00", tz=TIMEZONE)
+
+def test_read_topics_projects_columns(backend):
+    backend.add_topic(topic_row("議題1", "2030-01-01 12:00"))
+    assert list(backend.read_topics(["uuid", "status"]).columns) == ["uuid", "status"]
+
+def test_add_votes_ignores_duplicate_vote_id(backend):
+    backend.add_topic(topic_row("議題1", "2030-01-01 12:00"))
+    uuid = uuid_of(backend, "議題1")
+    row = vote_row(uuid, "A", "a@example.com", "v1")
+    backend.add_votes([row])
+    backend.add_votes([row])
+    assert len(backend.read_votes()) == 1
+    assert backend.existing_vote_ids(["v1", "v2"]) == {"v1"}
+
+def test_update_statuses_respects_owner(backend):
+    backend.add_topic(topic_row("mine", "2030-01-01 12:00"))
+    backend.add_topic(topic_row("theirs", "2030-01-01 12:00", owner="other@example.com"))
+    mine, theirs = uuid_of(backend, "mine"), uuid_of(backend, "theirs")
+
+    updated = backend.update_statuses([(mine, "closed"), (theirs, "closed")], "owner@example.com")
+    assert updated == [mine]
+    assert list(backend.finished_topics("owner@example.com")["uuid"]) == [mine]
+    assert backend.update_status(theirs, "deleted")
+
+def test_finished_topics_includes_expired_active_topics(backend):
+    backend.add_topic(topic_row("open", "2030-01-01 12:00"))
+    backend.add_topic(topic_row("expired", "2020-01-01 12:00"))
+    backend.add_topic(topic_row("no_deadline", ""))
+    backend.add_topic(topic_row("deleted", "2020-01-01 12:00", status="deleted"))
+    assert list(backend.finished_topics("owner@example.com")["title"]) == ["expired"]
+
+def test_archive_topics_moves_old_topics_with_votes(backend):
+    backend.add_topic(topic_row("old", "2020-01-01 12:00", status="closed"))
+    backend.add_topic(topic_row("active", "2020-01-01 12:00"))
+    backend.add_topic(topic_row("recent", "2030-01-01 12:00", status="closed"))
+    old = uuid_of(backend, "old")
+    backend.add_votes([vote_row(old, "A", "a@example.com", "v1")])
+
+    moved = backend.archive_topics(pd.Timestamp("2024-01-01", tz=TIMEZONE))
+
+    assert moved == 1
+    assert sorted(backend.read_topics()["title"]) == ["active", "recent"]
+    assert backend.read_votes().empty
+    assert list(backend.archived_topics("owner@example.com")["uuid"]) == [old]
+    assert list(backend.archived_votes(old)["vote_id"]) == ["v1"]
+    # 2 回目は何も移さない
+    assert backend.archive_topics(pd.Timestamp("2024-01-01", tz=TIMEZONE)) == 0
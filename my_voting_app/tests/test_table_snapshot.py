@@ -0,0 +1,83 @@
+import os
+
+import pandas as pd
+
+from db_handler import TableCache, TableSnapshot, VoteSync
+from fakes import fake_connection
+from storage import VOTE_COLUMNS
+
+
+class CountingSnapshot(TableSnapshot):
+    def __init__(self, directory):
+        super().__init__(directory)
+        self.saves = 0
+
+    def save(self, key, df, watermark):
+        self.saves += 1
+        super().save(key, df, watermark)
+
+
+def unexpected_load():
+    raise AssertionError("スナップショットがあるのに読み込んだ")
+
+def vote(n):
+    return ["議題", "A", "2024-01-01 10:00", f"user{n}@example.com", "topic-1", f"v{n}"]
+
+def votes_sheet(count):
+    return fake_connection({"votes": [VOTE_COLUMNS] + [vote(n) for n in range(count)]})
+
+
+def test_round_trip_keeps_data_and_watermark(tmp_path):
+    snapshot = TableSnapshot(str(tmp_path))
+    df = pd.DataFrame({"uuid": ["t1", "t2"], "title": ["議題1", "議題2"]})
+    snapshot.save("topics", df, {"marker": "2024-01-01T00:00:00Z"})
+
+    loaded, watermark = snapshot.load_all()["topics"]
+    assert loaded.to_dict("list") == df.to_dict("list")
+    assert loaded["title"].dtype == object
+    assert watermark == {"key": "topics", "marker": "2024-01-01T00:00:00Z"}
+
+def test_broken_snapshot_is_ignored(tmp_path):
+    snapshot = TableSnapshot(str(tmp_path))
+    snapshot.save("topics", pd.DataFrame({"uuid": ["t1"]}), {"marker": None})
+    os.remove(tmp_path / "topics.arrow")
+    assert snapshot.load_all() == {}
+    assert TableSnapshot(str(tmp_path / "missing")).load_all() == {}
+
+def test_table_cache_starts_from_the_snapshot(tmp_path):
+    snapshot = TableSnapshot(str(tmp_path))
+    snapshot.save("topics", pd.DataFrame({"uuid": ["t1"]}), {"marker": "m1"})
+
+    cache = TableCache(60, snapshot=snapshot)
+    assert cache.restored == ["topics"]
+    assert list(cache.get("topics", unexpected_load)["uuid"]) == ["t1"]
+
+def test_vote_sync_restores_and_reads_only_new_rows(tmp_path):
+    connection = votes_sheet(3)
+    VoteSync(connection, 3600, snapshot=TableSnapshot(str(tmp_path))).refresh()
+
+    connection._sheet.sheets["votes"].rows.append(vote(3))
+    connection._sheet.sheets["votes"].calls.clear()
+    restored = VoteSync(connection, 3600, snapshot=TableSnapshot(str(tmp_path)))
+    assert restored.row_count == 3
+
+    restored.refresh()
+    assert connection._sheet.sheets["votes"].calls == ["get"]
+    assert list(restored.frame()["vote_id"]) == ["v0", "v1", "v2", "v3"]
+
+def test_delta_syncs_save_the_snapshot_at_most_once_per_interval(tmp_path):
+    connection = votes_sheet(3)
+    snapshot = CountingSnapshot(str(tmp_path))
+    sync = VoteSync(connection, 3600, snapshot=snapshot, snapshot_interval=3600)
+    sync.refresh()
+    assert snapshot.saves == 1  # 全件を読んだ時は保存する
+
+    for n in range(3, 6):
+        connection._sheet.sheets["votes"].rows.append(vote(n))
+        sync.refresh()
+    assert sync.row_count == 6
+    assert snapshot.saves == 1
+
+    # 保存済みの行数までは正しいので、起動時は続きから読める
+    restored = VoteSync(connection, 3600, snapshot=TableSnapshot(str(tmp_path)))
+    assert restored.row_count == 3
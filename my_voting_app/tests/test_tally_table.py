@@ -0,0 +1,56 @@
+import pandas as pd
+
+from db_handler import TallyTable
+from storage import VOTE_COLUMNS
+
+
+class FakeJournal:
+    def __init__(self, pending=None):
+        self._pending = dict(pending or {})
+
+    def pending(self):
+        return dict(self._pending)
+
+
+def record(vote_id, option="A", email="a@example.com", uuid="topic-1"):
+    return dict(zip(VOTE_COLUMNS, ["議題", option, "2024-01-01 10:00", email, uuid, vote_id]))
+
+
+def test_vote_seen_at_write_and_sync_is_counted_once():
+    table = TallyTable(FakeJournal())
+    # 書き込み時（ジャーナル）と、保存先からの同期時に同じ投票が届く
+    table.votes_appended([record("v1")])
+    table.votes_appended([record("v1"), record("v2", "B", "b@example.com")])
+    assert table.tally("topic-1") == {"A": 1, "B": 1}
+
+def test_reset_includes_pending_journal_votes_once():
+    pending = record("v2", "B", "b@example.com")
+    table = TallyTable(FakeJournal({"v2": list(pending.values())}))
+    votes_df = pd.DataFrame([record("v1"), record("v2", "B", "b@example.com")])
+
+    table.votes_reset(votes_df)
+    assert table.tally("topic-1") == {"A": 1, "B": 1}
+
+def test_rows_without_vote_id_are_all_counted():
+    # vote_id 列が無かった頃の行は見分けられないので、すべて数える
+    table = TallyTable(FakeJournal())
+    table.votes_appended([record(""), record("", email="b@example.com")])
+    assert table.tally("topic-1") == {"A": 2}
+
+def test_tally_is_sorted_and_tracks_voters():
+    table = TallyTable(FakeJournal())
+    table.votes_appended([
+        record("v1", "A", "a@example.com"),
+        record("v2", "B", "b@example.com"),
+        record("v3", "B", "c@example.com"),
+    ])
+    assert list(table.tally("topic-1")) == ["B", "A"]
+    assert table.has_voted("topic-1", "b@example.com")
+    assert not table.has_voted("topic-1", "d@example.com")
+    assert table.tally("unknown") == {}
+
+def test_claim_rebuild_allows_one_rebuild_per_interval():
+    table = TallyTable(FakeJournal())
+    assert table.claim_rebuild(60)
+    assert not table.claim_rebuild(60)
+    assert table.claim_rebuild(0)
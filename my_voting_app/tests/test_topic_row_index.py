@@ -0,0 +1,52 @@
+import pandas as pd
+
+from db_handler import TopicRowIndex
+
+
+class FakeTopics:
+    """uuid / owner_email 列を返し、読み込んだ回数を数える。"""
+
+    def __init__(self, rows):
+        self.rows = rows
+        self.reads = 0
+
+    def __call__(self):
+        self.reads += 1
+        return pd.DataFrame(self.rows, columns=["uuid", "owner_email"])
+
+
+def test_lookup_returns_sheet_row_and_owner():
+    topics = FakeTopics([("u1", "a@example.com"), ("", ""), ("u3", "c@example.com")])
+    index = TopicRowIndex(topics, max_age=60)
+    # 1 行目は見出し
+    assert index.lookup("u1") == (2, "a@example.com")
+    assert index.lookup("u3") == (4, "c@example.com")
+    assert index.lookup("missing") is None
+    assert topics.reads == 1
+
+def test_unknown_uuid_reloads_only_after_mark_stale():
+    topics = FakeTopics([("u1", "a@example.com")])
+    index = TopicRowIndex(topics, max_age=60)
+    index.lookup("u1")
+
+    topics.rows.append(("u2", "b@example.com"))
+    assert index.lookup("u2") is None
+    index.mark_stale()
+    assert index.lookup("u2") == (3, "b@example.com")
+    assert topics.reads == 2
+
+def test_invalidate_forces_reload_after_rows_move():
+    topics = FakeTopics([("u1", "a@example.com"), ("u2", "b@example.com")])
+    index = TopicRowIndex(topics, max_age=60)
+    assert index.lookup("u2") == (3, "b@example.com")
+
+    del topics.rows[0]
+    index.invalidate()
+    assert index.lookup("u2") == (2, "b@example.com")
+
+def test_index_expires_after_max_age():
+    topics = FakeTopics([("u1", "a@example.com")])
+    index = TopicRowIndex(topics, max_age=0)
+    index.lookup("u1")
+    index.lookup("u1")
+    assert topics.reads == 2
@@ -0,0 +1,118 @@
+import time
+from concurrent.futures import Future
+
+import db_handler
+from conftest import wait_until
+from db_handler import VoteFlusher, VoteJournal
+
+
+def vote(vote_id):
+    # VOTE_COLUMNS の順
+    return ["議題", "A", "2024-01-01 10:00", f"{vote_id}@example.com", "topic-1", vote_id]
+
+
+class FakeWriter:
+    """submit() した行と Future を記録し、結果はテストから決める。"""
+
+    def __init__(self):
+        self.submitted = []
+
+    def submit(self, row):
+        future = Future()
+        self.submitted.append((row, future))
+        return future
+
+
+class FakeBackend:
+    def __init__(self, sent=(), header_errors=()):
+        self.sent = set(sent)
+        self.header_errors = list(header_errors)  # check_vote_header() で順に起こす例外
+        self.header_checks = 0
+
+    def check_vote_header(self):
+        self.header_checks += 1
+        if self.header_errors:
+            raise self.header_errors.pop(0)
+
+    def existing_vote_ids(self, vote_ids):
+        return self.sent & set(vote_ids)
+
+
+def test_replay_keeps_only_unflushed_votes(tmp_path):
+    path = str(tmp_path / "vote_journal.jsonl")
+    journal = VoteJournal(path)
+    journal.append("v1", vote("v1"))
+    journal.append("v2", vote("v2"))
+    journal.mark_flushed(["v1"])
+    # 書き込み途中で落ちた最終行
+    with open(path, "a", encoding="utf-8") as f:
+        f.write('{"op": "vote", "vote_id": "v3"')
+
+    assert VoteJournal(path).pending() == {"v2": vote("v2")}
+
+def test_file_is_emptied_when_everything_is_flushed(tmp_path):
+    path = tmp_path / "vote_journal.jsonl"
+    journal = VoteJournal(str(path))
+    journal.append("v1", vote("v1"))
+    journal.mark_flushed(["v1"])
+    assert path.read_text(encoding="utf-8") == ""
+    assert VoteJournal(str(path)).pending() == {}
+
+def test_votes_already_sent_before_restart_are_not_resubmitted(tmp_path):
+    journal = VoteJournal(str(tmp_path / "vote_journal.jsonl"))
+    journal.append("v1", vote("v1"))
+    writer = FakeWriter()
+    flusher = VoteFlusher(journal, writer, FakeBackend(sent={"v1"}))
+    try:
+        assert wait_until(lambda: not journal.pending())
+        assert writer.submitted == []
+    finally:
+        flusher.close()
+
+def test_slow_write_is_not_resubmitted(tmp_path, monkeypatch):
+    # 書き込みが再試行中で結果待ちの時間切れになっても、同じ投票をもう一度送らない
+    monkeypatch.setattr(db_handler, "VOTE_WRITE_TIMEOUT_SECONDS", 0.1)
+    journal = VoteJournal(str(tmp_path / "vote_journal.jsonl"))
+    writer = FakeWriter()
+    flusher = VoteFlusher(journal, writer, FakeBackend())
+    try:
+        journal.append("v1", vote("v1"))
+        flusher.wake()
+        assert wait_until(lambda: writer.submitted)
+        # 時間切れ → 1 秒待って次の回、まで進める
+        time.sleep(1.5)
+        assert len(writer.submitted) == 1
+
+        writer.submitted[0][1].set_result(True)
+        assert wait_until(lambda: not journal.pending())
+        assert len(writer.submitted) == 1
+    finally:
+        flusher.close()
+
+def test_votes_wait_until_the_header_is_checked(tmp_path):
+    journal = VoteJournal(str(tmp_path / "vote_journal.jsonl"))
+    journal.append("v1", vote("v1"))
+    writer = FakeWriter()
+    backend = FakeBackend(header_errors=[ConnectionError("offline")])
+    flusher = VoteFlusher(journal, writer, backend)
+    try:
+        assert wait_until(lambda: backend.header_checks == 1)
+        assert writer.submitted == []
+        # 1 秒後の再試行で確かめられたら送る
+        assert wait_until(lambda: writer.submitted)
+        assert flusher.header_error is None
+    finally:
+        flusher.close()
+
+def test_unfixable_header_is_reported_and_nothing_is_sent(tmp_path):
+    journal = VoteJournal(str(tmp_path / "vote_journal.jsonl"))
+    journal.append("v1", vote("v1"))
+    writer = FakeWriter()
+    error = RuntimeError("votes シートの見出しが想定と違います")
+    flusher = VoteFlusher(journal, writer, FakeBackend(header_errors=[error] * 10))
+    try:
+        assert wait_until(lambda: flusher.header_error is error)
+        assert writer.submitted == []
+        assert journal.pending()
+    finally:
+        flusher.close()
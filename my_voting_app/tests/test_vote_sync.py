@@ -0,0 +1,96 @@
+from db_handler import ChangeProbe, VoteSync
+from fakes import fake_connection
+from storage import VOTE_COLUMNS
+
+
+class FixedProbe(ChangeProbe):
+    def __init__(self, value):
+        super().__init__()
+        self.value = value
+
+    def _read_version(self):
+        return self.value
+
+
+class Listener:
+    def __init__(self):
+        self.appended = []
+        self.resets = 0
+
+    def votes_appended(self, records):
+        self.appended.extend(records)
+
+    def votes_reset(self, votes_df):
+        self.resets += 1
+
+
+def vote(n, vote_id=None):
+    return ["議題", "A", "2024-01-01 10:00", f"user{n}@example.com", "topic-1", vote_id or f"v{n}"]
+
+def make_sync(rows, full_resync_interval=3600, probe=None):
+    connection = fake_connection({"votes": [VOTE_COLUMNS] + rows})
+    sync = VoteSync(connection, full_resync_interval, probe)
+    listener = Listener()
+    sync.listeners.append(listener)
+    return sync, connection._sheet.sheets["votes"], listener
+
+
+def test_first_refresh_reads_everything():
+    sync, ws, listener = make_sync([vote(0), vote(1)])
+    sync.refresh()
+    assert ws.calls == ["get_all_values"]
+    assert sync.row_count == 2
+    assert listener.resets == 1
+    assert list(sync.frame()["vote_id"]) == ["v0", "v1"]
+
+def test_delta_reads_only_the_rows_after_the_last_one():
+    sync, ws, listener = make_sync([vote(0), vote(1)])
+    sync.refresh()
+    ws.rows += [vote(2), vote(3)]
+
+    sync.refresh()
+    # 見出し + 2 行の次（4 行目）から、見出しの列数（F 列）まで
+    assert ws.ranges == ["A4:F"]
+    assert sync.row_count == 4
+    assert [r["vote_id"] for r in listener.appended] == ["v2", "v3"]
+
+def test_short_rows_are_padded_to_the_header():
+    sync, ws, listener = make_sync([vote(0)])
+    sync.refresh()
+    # vote_id 列が無かった頃の行は、末尾の空セルが返ってこない
+    ws.rows.append(vote(1)[:5])
+
+    sync.refresh()
+    assert listener.appended[-1]["vote_id"] == ""
+    assert list(sync.frame()["vote_id"]) == ["v0", ""]
+
+def test_no_new_rows_past_the_grid_is_not_an_error():
+    sync, ws, listener = make_sync([vote(0)])
+    sync.refresh()
+
+    sync.refresh()
+    assert ws.calls == ["get_all_values", "get"]
+    assert sync.row_count == 1
+    assert listener.appended == []
+
+def test_full_resync_picks_up_manual_edits():
+    sync, ws, listener = make_sync([vote(0), vote(1)], full_resync_interval=0)
+    sync.refresh()
+    del ws.rows[1]
+
+    sync.refresh()
+    assert ws.calls == ["get_all_values", "get_all_values"]
+    assert list(sync.frame()["vote_id"]) == ["v1"]
+    assert listener.resets == 2
+
+def test_unchanged_marker_skips_the_read():
+    sync, ws, listener = make_sync([vote(0)], probe=FixedProbe("m1"))
+    sync.refresh()
+    ws.rows.append(vote(1))
+
+    sync.refresh()
+    assert ws.calls == ["get_all_values"]
+    # このプロセスで書き込んだ後は、印に関係なく読みに行く
+    sync.invalidate()
+    sync.refresh()
+    assert sync.row_count == 2
@@ -0,0 +1,81 @@
+import threading
+
+import pytest
+
+from db_handler import VoteQueueFullError, VoteWriter
+
+
+class FakeBackend:
+    def __init__(self, fail=None):
+        self.batches = []
+        self.fail = fail
+        self.entered = threading.Event()
+        self.release = threading.Event()
+        self.release.set()
+
+    def add_votes(self, rows):
+        self.entered.set()
+        self.release.wait(5)
+        if self.fail is not None:
+            raise self.fail
+        self.batches.append(list(rows))
+
+
+def row(n):
+    return ["議題", "A", "2024-01-01 10:00", f"user{n}@example.com", "topic-1", f"v{n}"]
+
+
+def test_votes_within_the_window_are_written_together():
+    backend = FakeBackend()
+    writer = VoteWriter(backend, window=0.3, max_rows=10, max_backlog=10)
+    try:
+        futures = [writer.submit(row(n)) for n in range(3)]
+        assert all(f.result(2) for f in futures)
+        assert backend.batches == [[row(0), row(1), row(2)]]
+    finally:
+        writer.close()
+
+def test_batches_are_split_at_max_rows():
+    backend = FakeBackend()
+    writer = VoteWriter(backend, window=0.3, max_rows=2, max_backlog=10)
+    try:
+        futures = [writer.submit(row(n)) for n in range(3)]
+        for future in futures:
+            future.result(2)
+        assert [len(batch) for batch in backend.batches] == [2, 1]
+    finally:
+        writer.close()
+
+def test_full_queue_is_rejected():
+    backend = FakeBackend()
+    backend.release.clear()
+    writer = VoteWriter(backend, window=0, max_rows=1, max_backlog=1)
+    try:
+        writer.submit(row(0))
+        assert backend.entered.wait(2)  # 1 件目は書き込み中
+        writer.submit(row(1))           # 2 件目はキューで待つ
+        with pytest.raises(VoteQueueFullError):
+            writer.submit(row(2))
+    finally:
+        backend.release.set()
+        writer.close()
+
+def test_failure_is_reported_to_every_future_in_the_batch():
+    backend = FakeBackend(fail=ConnectionError("offline"))
+    writer = VoteWriter(backend, window=0.3, max_rows=10, max_backlog=10)
+    try:
+        futures = [writer.submit(row(n)) for n in range(2)]
+        for future in futures:
+            with pytest.raises(ConnectionError):
+                future.result(2)
+    finally:
+        writer.close()
+
+def test_close_writes_what_is_queued_and_stops_accepting():
+    backend = FakeBackend()
+    writer = VoteWriter(backend, window=1, max_rows=10, max_backlog=10)
+    future = writer.submit(row(0))
+    writer.close()
+    assert future.result(0) is True
+    with pytest.raises(RuntimeError):
+        writer.submit(row(1))